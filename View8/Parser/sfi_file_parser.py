@@ -1,49 +1,149 @@
 from Parser.shared_function_info import SharedFunctionInfo, CodeLine
-from parse import parse
+import codecs
+import functools
 import re
+import sys
 import traceback
-from typing import List, Optional, Tuple, Dict, Set
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple, Dict
 
-# 全局：解析结果
+# 全局：解析结果（parse_file 未显式传入 ParseState 时写入这里，供 view8/simplify 读取）
 all_functions: Dict[str, SharedFunctionInfo] = {}
-repeat_last_line = False
 
-# 详细错误定位
-current_line_number = 0
-current_file_content: List[str] = []
-current_file_name: str = ""
+VERBOSE = False
 
-# 预扫描：地址(整数) -> 数组（数字列表）
-FIXED_ARRAYS: Dict[int, List[int]] = {}
+# 编码探测：读取的字节数与候选编码（latin-1 兜底，任何字节都能解码）
+_SNIFF_SIZE = 4096
+_ENCODINGS = ("utf-8", "gbk", "cp1252", "latin-1")
+
+# 块边界标记：驻留后，scan_file 里同样驻留的控制行与之比较时走指针相等的快路径
+_START_SFI = sys.intern("Start SharedFunctionInfo")
+_END_SFI = sys.intern("End SharedFunctionInfo")
+_START_FIXED_ARRAY = sys.intern("Start FixedArray")
+_END_FIXED_ARRAY = sys.intern("End FixedArray")
+_CONTROL_PREFIXES = ("Start ", "End ")
+
+# 预编译正则：逐行热路径上只做 .match/.search，不重复查 re 缓存
+_RX_BYTECODE = re.compile(r"[^@]*@ +(\d+) : ([0-9a-fA-F ]+?)\s+([A-Za-z_][A-Za-z0-9._]*(?:.*))$")
+_RX_OFFSET = re.compile(r"@ +(\d+)")
+_RX_FIXEDARR_INLINE = re.compile(r'(0x[0-9a-fA-F]+)\s*<FixedArray\[\d+\]>')
+_RX_VAL_TAG = re.compile(r"<[A-Za-z]+")
+_RX_OUTER_SCOPE = re.compile(r'^\s*-\s*outer scope info:\s*(0x[0-9a-fA-F]+)')
+_RX_OUTER_SCOPE_LOOSE = re.compile(r'\bouter scope info:\s*(0x[0-9a-fA-F]+)')
+_RX_SCOPE = re.compile(r'^\s*-\s*scope info:\s*(0x[0-9a-fA-F]+)')
+_RX_SCOPE_LOOSE = re.compile(r'(?<!outer )scope info:\s*(0x[0-9a-fA-F]+)')
+_RX_CONST_SIZE = re.compile(r"Constant pool\s*\(size\s*=\s*(\d+)\)")
+
+# FixedArray 预扫描
+_RX_FA_ADDR = re.compile(r'^\s*((?:0x)?[0-9a-fA-F]+):\s*\[FixedArray\]')
+_RX_FA_LEN = re.compile(r'^\s*-\s*length:\s*(\d+)\s*$')
+# 条目 "i: v" 或 "a-b: v"；整块拼成多行文本后一次 finditer（只用 [ \t]，避免跨行匹配）
+_RX_FA_BODY = re.compile(r'^(\d+)(?:[ \t]*-[ \t]*(\d+))?[ \t]*:[ \t]*(-?\d+)[ \t]*$', re.MULTILINE)
+
+# 异常表 / 计数 / 地址行
+_RX_EXC = re.compile(r"\(\s*(\d+)\s*,\s*(\d+)\s*\)\s+->\s+(\d+)\s+\(")
+_RX_PARAM = re.compile(r"Parameter count\s+(\d+)")
+_RX_REG = re.compile(r"Register count\s+(\d+)")
+_RX_ADDR = re.compile(r"([^:]+):\s*\[([^\]]+)\]")
+
+# 常量池条目
+# 范围行 "a-b: val" 与单索引行 "i: [0x... ]val" 合并为一个模式，每行只匹配一次
+_RX_CP_ENTRY = re.compile(
+    r"^\s*(?:(?P<rs>\d+)\s*-\s*(?P<re>\d+)\s*:\s*(?P<rv>.+)"
+    r"|(?P<si>\d+)\s*:\s*(?P<addr>0x[0-9a-fA-F]+\s+)?(?P<sv>.+))$"
+)
+
+
+class LineCursor:
+    """
+    预先去空行、strip 后的行列表 + 下标游标，支持回推一行（由 scan_file 构建）。
+    line_numbers 与 lines 平行，记录每行在原文件中的行号（供 log_error 定位）。
+    """
 
-VERBOSE = False
+    def __init__(self, lines: List[str], line_numbers: List[int]):
+        self.lines = lines
+        self.line_numbers = line_numbers
+        self.idx = 0
+
+    def next(self) -> Optional[str]:
+        # 读到末尾后持续返回 None；idx 仍然递增，保证 push_back 恰好撤销一次 next
+        idx = self.idx
+        self.idx = idx + 1
+        if idx < len(self.lines):
+            return self.lines[idx]
+        return None
 
+    def peek(self) -> Optional[str]:
+        # 查看下一行但不前进
+        if self.idx < len(self.lines):
+            return self.lines[self.idx]
+        return None
 
-def set_repeat_line_flag(flag: bool):
-    global repeat_last_line
-    repeat_last_line = flag
+    def push_back(self):
+        self.idx -= 1
 
+    @property
+    def line_number(self) -> int:
+        if not self.line_numbers or self.idx <= 0:
+            return 0
+        return self.line_numbers[min(self.idx, len(self.line_numbers)) - 1]
 
-def read_file_with_best_encoding(file_path: str) -> List[str]:
-    encodings = ["utf-8", "utf-8-sig", "gbk", "cp936", "cp1252", "latin-1"]
-    last_error: Optional[Exception] = None
-    for enc in encodings:
+
+@dataclass
+class ParseState:
+    """
+    一次 parse_file 的全部可变状态，作为首参显式传递（热路径上走局部/属性访问而非全局查找）。
+    """
+    all_functions: Dict[str, SharedFunctionInfo] = field(default_factory=dict)
+    # 预扫描：地址(整数) -> 数组（数字列表）
+    fixed_arrays: Dict[int, List[int]] = field(default_factory=dict)
+    # 地址(整数) -> 已格式化的 JS 数组字面量（首次被常量池引用时才生成）
+    fixed_arrays_str: Dict[int, str] = field(default_factory=dict)
+    cursor: Optional[LineCursor] = None
+    # 详细错误定位
+    file_name: str = ""
+    file_content: List[str] = field(default_factory=list)
+
+
+def _sniff_encoding(head: bytes) -> str:
+    """
+    只看文件开头一段字节决定编码：先看 BOM，再依次尝试增量解码。
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    for enc in _ENCODINGS:
         try:
-            with open(file_path, "r", encoding=enc, errors="strict") as f:
-                return f.readlines()
-        except UnicodeDecodeError as e:
-            last_error = e
-            continue
-        except Exception as e:
-            last_error = e
+            # final=False：截断在多字节字符中间的结尾不算错误
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
             continue
+    return _ENCODINGS[-1]
 
-    print(
-        f"WARNING: Could not decode file with common encodings. "
-        f"Falling back to utf-8 with replacement. Last error: {last_error}"
-    )
-    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
-        return f.readlines()
+
+def read_file_with_best_encoding(file_path: str) -> List[str]:
+    """
+    只打开/读取一次文件；按开头探测出的编码整体解码一次。
+    探测通过但后文解码失败时，才按 _ENCODINGS 顺序逐个重试（内存中进行）。
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    enc = _sniff_encoding(data[:_SNIFF_SIZE])
+    try:
+        text = data.decode(enc)
+    except UnicodeDecodeError:
+        for fallback in _ENCODINGS:
+            if fallback == enc:
+                continue
+            try:
+                text = data.decode(fallback)
+                break
+            except UnicodeDecodeError:
+                continue
+    # 行尾的 \r 由调用方 strip 去掉
+    return text.split("\n")
 
 
 def normalize_addr(addr_str: str) -> Optional[int]:
@@ -56,135 +156,101 @@ def normalize_addr(addr_str: str) -> Optional[int]:
         return None
 
 
-def collect_fixed_arrays(file_path: str):
+# scan_file 状态机
+_SCAN_TOP = 0        # 块外
+_SCAN_FA_ADDR = 1    # 刚进入 Start FixedArray，等待地址行
+_SCAN_FA_LEN = 2     # 等待 length 行
+_SCAN_FA_BODY = 3    # 解析条目
+_SCAN_FA_SKIP = 4    # 无法识别的 FixedArray，跳到 End
+
+
+def scan_file(state: ParseState, file_path: str) -> LineCursor:
     """
-    预扫描所有 Start FixedArray 块，建立地址(整数) -> 数组 的映射。
+    单遍扫描：只读取/解码一次文件，逐行 strip、去空行构建 LineCursor，
+    同时用状态机收集所有 Start FixedArray 块，建立地址(整数) -> 数组 的映射。
     仅收集纯数字元素（SMI），范围 i-j: v 会填充每个索引。
     """
-    global FIXED_ARRAYS
-    FIXED_ARRAYS.clear()
-
-    lines = read_file_with_best_encoding(file_path)
-    i = 0
-    N = len(lines)
-
-    rx_addr = re.compile(r'^\s*((?:0x)?[0-9a-fA-F]+):\s*\[FixedArray\]')
-    rx_len = re.compile(r'^\s*-\s*length:\s*(\d+)\s*$')
-    rx_single = re.compile(r'^\s*(\d+)\s*:\s*(-?\d+)\s*$')
-    rx_range = re.compile(r'^\s*(\d+)\s*-\s*(\d+)\s*:\s*(-?\d+)\s*$')
-
-    while i < N:
-        if lines[i].strip() == "Start FixedArray":
-            # 地址行
-            i += 1
-            if i >= N:
-                break
-            m_addr = rx_addr.match(lines[i].strip())
-            if not m_addr:
-                # 往后探两行
-                found = False
-                for j in range(i, min(i + 3, N)):
-                    m2 = rx_addr.match(lines[j].strip())
-                    if m2:
-                        i = j
-                        m_addr = m2
-                        found = True
-                        break
-                if not found:
-                    # 跳过到 End FixedArray
-                    while i < N and lines[i].strip() != "End FixedArray":
-                        i += 1
-                    i += 1
-                    continue
-            addr_int = normalize_addr(m_addr.group(1))
-            length = None
-            arr: Dict[int, int] = {}
-
-            # 找 length
-            j = i + 1
-            while j < N:
-                l = lines[j].strip()
-                m_len = rx_len.match(l)
-                if m_len:
-                    length = int(m_len.group(1))
-                    j += 1
-                    break
-                j += 1
-
-            if length is None:
-                # 跳到 End
-                while j < N and lines[j].strip() != "End FixedArray":
-                    j += 1
-                i = j + 1
-                continue
-
-            # 解析条目
-            while j < N:
-                l = lines[j].strip()
-                if l == "End FixedArray":
-                    break
-                m_r = rx_range.match(l)
-                if m_r:
-                    s = int(m_r.group(1)); e = int(m_r.group(2)); v = int(m_r.group(3))
-                    for k in range(s, e + 1):
-                        if 0 <= k < length:
-                            arr[k] = v
-                    j += 1
-                    continue
-                m_s = rx_single.match(l)
-                if m_s:
-                    idx = int(m_s.group(1)); v = int(m_s.group(2))
-                    if 0 <= idx < length:
-                        arr[idx] = v
-                    j += 1
-                    continue
-                # 其它行忽略
-                j += 1
+    state.file_name = file_path
+    try:
+        state.file_content = read_file_with_best_encoding(file_path)
+    except Exception as e:
+        log_error(state, f"Fatal error parsing file '{file_path}': {e}")
+        print(f"Traceback:\n{traceback.format_exc()}")
+        state.file_content = []
+
+    fixed_arrays = state.fixed_arrays
+    intern = sys.intern
+    rx_addr = _RX_FA_ADDR
+    rx_len = _RX_FA_LEN
+    rx_body = _RX_FA_BODY
+
+    lines: List[str] = []
+    line_numbers: List[int] = []
+    scan = _SCAN_TOP
+    addr_probe = 0
+    addr_int: Optional[int] = None
+    length = 0
+    body_start = 0
+
+    for line_num, raw in enumerate(state.file_content, 1):
+        l = raw.strip()
+        if not l:
+            continue
+        # 只驻留短的 Start/End 控制行，长数据行驻留无益
+        if len(l) < 40 and l.startswith(_CONTROL_PREFIXES):
+            l = intern(l)
+        lines.append(l)
+        line_numbers.append(line_num)
+
+        if scan == _SCAN_TOP:
+            if l == _START_FIXED_ARRAY:
+                scan = _SCAN_FA_ADDR
+                addr_probe = 3  # 地址行最多往后探三行
+            continue
 
-            if addr_int is not None:
+        if l == _END_FIXED_ARRAY:
+            if scan == _SCAN_FA_BODY and addr_int is not None:
+                # 条目行已随 lines 收下，这里把 length 行与 End 之间的整段交给 finditer
                 out = [0] * length
-                for k, v in arr.items():
-                    out[k] = v
-                FIXED_ARRAYS[addr_int] = out
-
-            # 跳过 End FixedArray
-            while j < N and lines[j].strip() != "End FixedArray":
-                j += 1
-            i = j + 1
+                for m in rx_body.finditer("\n".join(lines[body_start:-1])):
+                    s = int(m.group(1)); v = int(m.group(3))
+                    e = int(m.group(2)) if m.group(2) is not None else s
+                    lo = max(0, s); hi = min(length - 1, e)
+                    if lo <= hi:
+                        out[lo:hi + 1] = [v] * (hi - lo + 1)
+                fixed_arrays[addr_int] = out
+            scan = _SCAN_TOP
             continue
 
-        i += 1
+        if scan == _SCAN_FA_ADDR:
+            m_addr = rx_addr.match(l)
+            if m_addr:
+                addr_int = normalize_addr(m_addr.group(1))
+                scan = _SCAN_FA_LEN
+            else:
+                addr_probe -= 1
+                if addr_probe == 0:
+                    scan = _SCAN_FA_SKIP
+            continue
 
+        if scan == _SCAN_FA_LEN:
+            m_len = rx_len.match(l)
+            if m_len:
+                length = int(m_len.group(1))
+                body_start = len(lines)
+                scan = _SCAN_FA_BODY
+            continue
 
-def get_next_line(file_path: str):
-    """
-    逐行（去空行）生成器，支持回推一行。
-    调用 parse_file 时会先 collect_fixed_arrays。
-    """
-    global current_line_number, current_file_content, current_file_name
-    current_file_name = file_path
-    try:
-        current_file_content = read_file_with_best_encoding(file_path)
-    except Exception as e:
-        log_error(f"Fatal error parsing file '{file_path}': {e}")
-        print(f"Traceback:\n{traceback.format_exc()}")
-        yield None
-        return
+        # _SCAN_FA_BODY / _SCAN_FA_SKIP：条目行只收进 lines，等 End 时整块解析
 
-    for line_num, raw in enumerate(current_file_content, 1):
-        current_line_number = line_num
-        line = raw.strip()
-        if not line:
-            continue
-        yield line
-        if repeat_last_line:
-            set_repeat_line_flag(False)
-            yield line
-    yield None
+    state.cursor = LineCursor(lines, line_numbers)
+    return state.cursor
 
 
-def log_error(message: str, context: str = ""):
-    global current_line_number, current_file_content, current_file_name
+def log_error(state: ParseState, message: str, context: str = ""):
+    current_line_number = state.cursor.line_number if state.cursor is not None else 0
+    current_file_name = state.file_name
+    current_file_content = state.file_content
     location = f"{current_file_name}:{current_line_number}" if current_file_name else f"line {current_line_number}"
     print(f"ERROR at {location}: {message}")
     if context:
@@ -204,18 +270,19 @@ def log_error(message: str, context: str = ""):
 # Bytecode 解析
 # --------------------------
 
-def parse_bytecode_line(line: str) -> Optional[CodeLine]:
-    m = re.search(r"^[^@]*@ +(\d+) : ([0-9a-fA-F ]+?)\s+([A-Za-z_][A-Za-z0-9._]*(?:.*))$", line)
+def parse_bytecode_line(state: ParseState, line: str) -> Optional[CodeLine]:
+    # match 自带行首锚定；偏移转成整数成功后才去做 opcode/inst 的 strip
+    m = _RX_BYTECODE.match(line)
     if m:
-        offset, opcode, inst = m.groups()
+        offset = m.group(1)
         try:
-            line_num = int(offset.strip())
-            return CodeLine(opcode=opcode.strip(), line=line_num, inst=inst.strip())
+            line_num = int(offset)
         except ValueError:
-            log_error(f"Could not parse offset '{offset}' in bytecode line", line)
+            log_error(state, f"Could not parse offset '{offset}' in bytecode line", line)
             return None
+        return CodeLine(opcode=m.group(2).strip(), line=line_num, inst=m.group(3).strip())
 
-    m2 = re.search(r"@ +(\d+)", line)
+    m2 = _RX_OFFSET.search(line)
     if m2:
         try:
             line_num = int(m2.group(1))
@@ -225,35 +292,31 @@ def parse_bytecode_line(line: str) -> Optional[CodeLine]:
     return None
 
 
-def parse_bytecode(first_line: str, lines) -> List[CodeLine]:
-    code_list: List[CodeLine] = []
+def parse_bytecode(state: ParseState, first_line: str) -> List[CodeLine]:
+    cursor = state.cursor
+    # 偏移 -> 首次出现的 CodeLine（同偏移去重）
+    seen: Dict[int, CodeLine] = {}
+    _append = seen.setdefault
     current_line = first_line
 
     while current_line is not None and " @ " in current_line:
-        parsed = parse_bytecode_line(current_line)
+        parsed = parse_bytecode_line(state, current_line)
         if parsed is not None:
-            code_list.append(parsed)
-        current_line = next(lines)
+            _append(parsed.line_num, parsed)
+        current_line = cursor.next()
 
     if current_line and " @ " not in current_line:
-        set_repeat_line_flag(True)
-
-    # 以偏移排序并去重
-    code_list.sort(key=lambda x: x.line_num)
-    uniq: List[CodeLine] = []
-    seen: Set[int] = set()
-    for c in code_list:
-        if c.line_num in seen:
-            continue
-        seen.add(c.line_num)
-        uniq.append(c)
-    return uniq
+        cursor.push_back()
+
+    # 以偏移排序
+    return sorted(seen.values(), key=lambda x: x.line_num)
 
 
 # --------------------------
 # 常量池与嵌套块解析
 # --------------------------
 
+@functools.lru_cache(maxsize=65536)
 def _parse_string_value(text: str) -> str:
     """
     把 <String[n]: #name> 或 <String[n]: name> 标准化为 "name"
@@ -270,93 +333,121 @@ def _parse_string_value(text: str) -> str:
     return f'"{t}"'
 
 
-def _inline_fixed_array_from_val(raw_val: str) -> Optional[str]:
+@functools.lru_cache(maxsize=65536)
+def _strip_value_tag(val: str) -> str:
+    """
+    其它带标签的值（<HeapNumber 1.5> 等）：去掉标签名，保留右侧可读部分
+    """
+    return val.rstrip('>').split(" ", 1)[-1]
+
+
+def _inline_fixed_array_from_val(state: ParseState, raw_val: str) -> Optional[str]:
     """
     尝试从值文本中提取 FixedArray 地址，并将其内联为 JS 数组字面量。
     支持：..., 0x... <FixedArray[N]> 这种形态。
     """
-    m = re.search(r'(0x[0-9a-fA-F]+)\s*<FixedArray\[\d+\]>', raw_val)
+    m = _RX_FIXEDARR_INLINE.search(raw_val)
     if not m:
         return None
     addr = normalize_addr(m.group(1))
     if addr is None:
         return None
-    nums = FIXED_ARRAYS.get(addr)
+    cached = state.fixed_arrays_str.get(addr)
+    if cached is not None:
+        return cached
+    nums = state.fixed_arrays.get(addr)
     if nums is None:
         return None
-    return "[" + ", ".join(str(n) for n in nums) + "]"
+    # str.join 对非序列参数会先物化成 list；这里直接给 list，避免再走一次迭代器协议
+    parts = list(map(str, nums))
+    text = "[" + ", ".join(parts) + "]"
+    state.fixed_arrays_str[addr] = text
+    return text
 
 
-def skip_block(lines, start_line: str):
+def skip_block(cursor: LineCursor, start_line: str):
     """
     跳过一整个 Start ... / End ... 结构块（ObjectBoilerplateDescription、ArrayBoilerplateDescription、FixedArray等）。
     前置：当前 start_line 为以 "Start " 开头的行。
+    同类块嵌套时（如 FixedArray 内再出现 Start FixedArray）按深度计数，直到最外层的 End 为止。
     """
-    kind = start_line.strip().split(" ", 1)[-1]
-    end_marker = f"End {kind}"
-    while True:
-        try:
-            l = next(lines)
-        except StopIteration:
-            break
-        if l.strip() == end_marker:
-            break
-
-
-def _parse_const_value_from_single(address: Optional[str], value: str, lines, func_name: str) -> str:
+    start_line = start_line.strip()
+    end_marker = sys.intern("End " + start_line[6:])
+    depth = 1
+    while depth:
+        l = cursor.next()
+        if l is None:
+            return
+        if l == start_line:
+            depth += 1
+        elif l == end_marker:
+            depth -= 1
+
+
+def _const_sfi(state: ParseState, val: str, func_name: str) -> str:
+    # 只有在下一行真开始时，才递归解析嵌套 SFI
+    cursor = state.cursor
+    if cursor.peek() == _START_SFI:
+        cursor.next()
+        nested_label = val.split(" ", 1)[-1].rstrip('> ') if " " in val else ""
+        nested_name = parse_shared_function_info(state, nested_label, func_name)
+        return nested_name
+    short = val.split()[-1].rstrip(">") if " " in val else "unknown"
+    return f"func_ref_{short}"
+
+
+def _const_array(state: ParseState, val: str, func_name: str) -> str:
+    # 能内联的 FixedArray 已在分派前处理
+    return "[]"
+
+
+def _const_object(state: ParseState, val: str, func_name: str) -> str:
+    # 对象模板块会在常量池之后详细展开，这里只给占位 "{}"
+    return "{}"
+
+
+def _const_oddball(state: ParseState, val: str, func_name: str) -> str:
+    if val.startswith("<Odd Oddball"):
+        return "null"
+    return _strip_value_tag(val)
+
+
+# 标签名（"<" 加首个单词）-> 常量值处理函数；未登记的标签走 _strip_value_tag
+_TAG_DISPATCH: Dict[str, Callable[[ParseState, str, str], str]] = {
+    "<SharedFunctionInfo": _const_sfi,
+    "<ArrayBoilerplateDescription": _const_array,
+    "<ObjectBoilerplateDescription": _const_object,
+    "<FixedArray": _const_array,
+    "<Odd": _const_oddball,
+}
+
+
+def _parse_const_value_from_single(state: ParseState, address: Optional[str], value: str, func_name: str) -> str:
     val = value.strip()
 
     if address:
-        if val.startswith("<String"):
+        m = _RX_VAL_TAG.match(val)
+        tag = m.group(0) if m else ""
+        if tag == "<String":
             return _parse_string_value(val)
 
         # 优先尝试内联 FixedArray
-        inline = _inline_fixed_array_from_val(val)
+        inline = _inline_fixed_array_from_val(state, val)
         if inline is not None:
             return inline
 
-        if val.startswith("<SharedFunctionInfo"):
-            # 只有在下一行真开始时，才递归解析嵌套 SFI
-            try:
-                peek = next(lines)
-                if peek == "Start SharedFunctionInfo":
-                    nested_label = val.split(" ", 1)[-1].rstrip('> ') if " " in val else ""
-                    nested_name = parse_shared_function_info(lines, nested_label, func_name)
-                    return nested_name
-                else:
-                    set_repeat_line_flag(True)
-            except StopIteration:
-                pass
-            short = val.split()[-1].rstrip(">") if " " in val else "unknown"
-            return f"func_ref_{short}"
-
-        if val.startswith("<ArrayBoilerplateDescription"):
-            inline = _inline_fixed_array_from_val(val)
-            if inline is not None:
-                return inline
-            return "[]"
-
-        if val.startswith("<ObjectBoilerplateDescription"):
-            # 对象模板块会在常量池之后详细展开，这里只给占位 "{}"
-            return "{}"
-
-        if val.startswith("<FixedArray"):
-            inline = _inline_fixed_array_from_val(val)
-            if inline is not None:
-                return inline
-            return "[]"
-
-        if val.startswith("<Odd Oddball"):
-            return "null"
+        handler = _TAG_DISPATCH.get(tag)
+        if handler is not None:
+            return handler(state, val, func_name)
 
         # 其它带标签的，保留右侧可读部分
-        return val.rstrip('>').split(" ", 1)[-1]
+        return _strip_value_tag(val)
 
     # 无地址：纯字面量/数字/布尔/Corrupted 文本
     return val
 
 
-def parse_const_pool(line: str, lines, func_name: str) -> List[str]:
+def parse_const_pool(state: ParseState, line: str, func_name: str) -> List[str]:
     """
     解析“Constant pool (size = N)”：
     - 持续采集到恰好 N 个索引被赋值；
@@ -364,7 +455,7 @@ def parse_const_pool(line: str, lines, func_name: str) -> List[str]:
       Start ArrayBoilerplateDescription、Start FixedArray 等，均在本函数内消费完后继续；
     - 只有当 N 个项都收齐，或遇到父块的 Start BytecodeArray/Handler Table/Source Position Table 才结束。
     """
-    m = re.search(r"Constant pool\s*\(size\s*=\s*(\d+)\)", line)
+    m = _RX_CONST_SIZE.search(line)
     if not m:
         return []
     size = int(m.group(1))
@@ -374,40 +465,44 @@ def parse_const_pool(line: str, lines, func_name: str) -> List[str]:
     const_list: List[Optional[str]] = [None] * size
     assigned = 0
 
-    rx_range = re.compile(r"^\s*(\d+)\s*-\s*(\d+)\s*:\s*(.+)$")
-    rx_single = re.compile(r"^\s*(\d+)\s*:\s*(0x[0-9a-fA-F]+\s+)?(.+)$")
+    cursor = state.cursor
+    fns = state.all_functions
+    rx_entry = _RX_CP_ENTRY
 
     while True:
-        try:
-            l = next(lines)
-        except StopIteration:
+        s = cursor.next()
+        if s is None:
             break
 
-        s = l.strip()
-
         # 采满 N 个索引则停止；把这行回推给上层（通常是 Handler Table/Bytecode 开始）
         if assigned >= size:
-            set_repeat_line_flag(True)
+            cursor.push_back()
             break
 
         # 子块：递归/跳过后继续
-        if s == "Start SharedFunctionInfo":
-            parse_shared_function_info(lines, f"nested_{len(all_functions)}", func_name)
+        if s == _START_SFI:
+            parse_shared_function_info(state, f"nested_{len(fns)}", func_name)
             continue
-        if s.startswith("Start ObjectBoilerplateDescription") or s.startswith("Start ArrayBoilerplateDescription") or s.startswith("Start FixedArray"):
-            skip_block(lines, s)
+        if s[:5] == "Start" and (s.startswith("Start ObjectBoilerplateDescription")
+                                 or s.startswith("Start ArrayBoilerplateDescription")
+                                 or s.startswith("Start FixedArray")):
+            skip_block(cursor, s)
             continue
 
         # 父块边界（如果未收满，只能结束）
-        if s.startswith("Start BytecodeArray") or s.startswith("Handler Table") or s.startswith("Source Position Table") or s == "End SharedFunctionInfo":
-            set_repeat_line_flag(True)
+        if s.startswith("Start BytecodeArray") or s.startswith("Handler Table") or s.startswith("Source Position Table") or s == _END_SFI:
+            cursor.push_back()
             break
 
+        m_entry = rx_entry.match(s)
+        if m_entry is None:
+            # 其它行忽略（map/length/...）
+            continue
+
         # 范围行
-        m_range = rx_range.match(s)
-        if m_range:
-            si = int(m_range.group(1)); ei = int(m_range.group(2))
-            raw_val = m_range.group(3).strip()
+        if m_entry.group('rs') is not None:
+            si = int(m_entry.group('rs')); ei = int(m_entry.group('re'))
+            raw_val = m_entry.group('rv').strip()
             for idx in range(si, ei + 1):
                 if 0 <= idx < size and const_list[idx] is None:
                     const_list[idx] = raw_val
@@ -415,18 +510,12 @@ def parse_const_pool(line: str, lines, func_name: str) -> List[str]:
             continue
 
         # 单索引
-        m_single = rx_single.match(s)
-        if m_single:
-            idx = int(m_single.group(1))
-            addr = m_single.group(2)
-            val = m_single.group(3)
-            if 0 <= idx < size and const_list[idx] is None:
-                const_list[idx] = _parse_const_value_from_single(addr, val, lines, func_name)
-                assigned += 1
-            continue
-
-        # 其它行忽略（map/length/...）
-        continue
+        idx = int(m_entry.group('si'))
+        addr = m_entry.group('addr')
+        val = m_entry.group('sv')
+        if 0 <= idx < size and const_list[idx] is None:
+            const_list[idx] = _parse_const_value_from_single(state, addr, val, func_name)
+            assigned += 1
 
     # 填补空位
     for i in range(size):
@@ -441,44 +530,49 @@ def parse_const_pool(line: str, lines, func_name: str) -> List[str]:
 # --------------------------
 
 def parse_exception_table_line(line: str) -> Tuple[int, List[int]]:
-    from_, to_, key, _ = parse("({},{})  -> {} ({}", line)
-    return int(key), [int(from_), int(to_)]
+    m = _RX_EXC.match(line)
+    if not m:
+        raise ValueError(f"Invalid handler table line format: {line}")
+    return int(m.group(3)), [int(m.group(1)), int(m.group(2))]
 
 
-def parse_handler_table(line: str, lines) -> Dict[int, List[int]]:
+def parse_handler_table(state: ParseState, line: str) -> Dict[int, List[int]]:
     if "size = 0" in line:
         return {}
+    cursor = state.cursor
     exception_table: Dict[int, List[int]] = {}
-    nxt = next(lines)
+    nxt = cursor.next()
     if nxt is None:
         return {}
     while True:
-        line = next(lines)
+        line = cursor.next()
         if line is None or " -> " not in line:
             break
         key, value = parse_exception_table_line(line)
         exception_table[key] = value
-    set_repeat_line_flag(True)
+    cursor.push_back()
     return exception_table
 
 
 def parse_parameter_count(line: str) -> int:
-    return int(parse("Parameter count {}", line)[0])
+    m = _RX_PARAM.match(line)
+    if not m:
+        raise ValueError(f"Invalid parameter count line format: {line}")
+    return int(m.group(1))
 
 
 def parse_register_count(line: str) -> int:
-    return int(parse("Register count {}", line)[0])
+    m = _RX_REG.match(line)
+    if not m:
+        raise ValueError(f"Invalid register count line format: {line}")
+    return int(m.group(1))
 
 
 def parse_address(line: str) -> str:
-    # Try the full format first
-    res = parse("{}: [{}] in {}", line)
-    if res:
-        return res[0]
-    # Fallback to shorter format without "in {}"
-    res = parse("{}: [{}]", line)
-    if res:
-        return res[0]
+    # "<addr>: [<type>] in <space>"，也兼容没有 "in ..." 的短格式
+    m = _RX_ADDR.match(line)
+    if m:
+        return m.group(1)
     # If neither matches, raise an error for debugging
     raise ValueError(f"Invalid address line format: {line}")
 
@@ -487,7 +581,9 @@ def parse_address(line: str) -> str:
 # SharedFunctionInfo 解析
 # --------------------------
 
-def parse_shared_function_info(lines, name: str, declarer: Optional[str] = None) -> str:
+def parse_shared_function_info(state: ParseState, name: str, declarer: Optional[str] = None) -> str:
+    cursor = state.cursor
+    fns = state.all_functions
     sfi = SharedFunctionInfo()
     sfi.declarer = declarer
     sfi.name = 'func_unknown'
@@ -496,34 +592,33 @@ def parse_shared_function_info(lines, name: str, declarer: Optional[str] = None)
     sfi.outer_scope_info_addr = None
     try:
         while True:
-            try:
-                line = next(lines)
-            except StopIteration:
+            line = cursor.next()
+            if line is None or line == _END_SFI:
                 break
 
-            if line is None or line == "End SharedFunctionInfo":
-                break
-
-            # 先匹配 outer，再匹配 scope，避免 “scope info” 命中 “outer scope info” 子串
-            m_outer = re.search(r'^\s*-\s*outer scope info:\s*(0x[0-9a-fA-F]+)', line)
-            if not m_outer:
-                # 宽松兜底（不以 - 开头的行）
-                m_outer = re.search(r'\bouter scope info:\s*(0x[0-9a-fA-F]+)', line)
-            if m_outer:
-                sfi.outer_scope_info_addr = m_outer.group(1)
-                continue
+            # 四个 scope 正则都要求字面 "scope info:"，先用子串测试挡掉绝大多数行
+            # 地址驻留：simplify 里以它为键反复查 SCOPEINFO_PARENT/SCOPE_CTXID，相同地址共用同一对象
+            if "scope info:" in line:
+                # 先匹配 outer，再匹配 scope，避免 “scope info” 命中 “outer scope info” 子串
+                m_outer = _RX_OUTER_SCOPE.search(line)
+                if not m_outer:
+                    # 宽松兜底（不以 - 开头的行）
+                    m_outer = _RX_OUTER_SCOPE_LOOSE.search(line)
+                if m_outer:
+                    sfi.outer_scope_info_addr = sys.intern(m_outer.group(1))
+                    continue
 
-            m_scope = re.search(r'^\s*-\s*scope info:\s*(0x[0-9a-fA-F]+)', line)
-            if not m_scope:
-                # 宽松兜底：禁止匹配 'outer scope info' 中的 'scope info' 子串
-                m_scope = re.search(r'(?<!outer )scope info:\s*(0x[0-9a-fA-F]+)', line)
-            if m_scope:
-                sfi.scope_info_addr = m_scope.group(1)
-                continue
+                m_scope = _RX_SCOPE.search(line)
+                if not m_scope:
+                    # 宽松兜底：禁止匹配 'outer scope info' 中的 'scope info' 子串
+                    m_scope = _RX_SCOPE_LOOSE.search(line)
+                if m_scope:
+                    sfi.scope_info_addr = sys.intern(m_scope.group(1))
+                    continue
 
-            if line == "Start SharedFunctionInfo":
-                nested_name = f"nested_{len(all_functions)}"
-                parse_shared_function_info(lines, nested_name, sfi.name)
+            if line == _START_SFI:
+                nested_name = f"nested_{len(fns)}"
+                parse_shared_function_info(state, nested_name, sfi.name)
                 continue
 
             if "Parameter count" in line:
@@ -535,15 +630,15 @@ def parse_shared_function_info(lines, name: str, declarer: Optional[str] = None)
                 continue
 
             if "Constant pool" in line:
-                sfi.const_pool = parse_const_pool(line, lines, sfi.name)
+                sfi.const_pool = parse_const_pool(state, line, sfi.name)
                 continue
 
             if "Handler Table" in line:
-                sfi.exception_table = parse_handler_table(line, lines)
+                sfi.exception_table = parse_handler_table(state, line)
                 continue
 
             if "@    0 : " in line:
-                sfi.code = parse_bytecode(line, lines)
+                sfi.code = parse_bytecode(state, line)
                 continue
 
             if "[SharedFunctionInfo]" in line or "[BytecodeArray]" in line:
@@ -565,19 +660,22 @@ def parse_shared_function_info(lines, name: str, declarer: Optional[str] = None)
 
         # 补齐偏移占位，便于后续处理
         if sfi.code:
-            offs = [c.line_num for c in sfi.code]
-            if offs:
-                exist = set(offs)
-                for off in range(min(offs), max(offs) + 1):
-                    if off not in exist:
-                        sfi.code.append(CodeLine(opcode="", line=off, inst="// placeholder"))
-                sfi.code.sort(key=lambda x: x.line_num)
-
-        all_functions[sfi.name] = sfi
+            # parse_bytecode 返回的行已按偏移排序，首尾即最小/最大偏移
+            lo, hi = sfi.code[0].line_num, sfi.code[-1].line_num
+            # 按偏移直接落位，空位再补占位行：单次线性扫描，无需排序
+            full: List[Optional[CodeLine]] = [None] * (hi - lo + 1)
+            for c in sfi.code:
+                full[c.line_num - lo] = c
+            for i, c in enumerate(full):
+                if c is None:
+                    full[i] = CodeLine(opcode="", line=lo + i, inst="// placeholder")
+            sfi.code = full
+
+        fns[sfi.name] = sfi
         return sfi.name
 
     except Exception as e:
-        log_error(f"Error parsing SharedFunctionInfo '{name}': {e}")
+        log_error(state, f"Error parsing SharedFunctionInfo '{name}': {e}")
         print(f"Traceback:\n{traceback.format_exc()}")
         # 兜底保存
         if sfi.argument_count is None:
@@ -590,7 +688,7 @@ def parse_shared_function_info(lines, name: str, declarer: Optional[str] = None)
             sfi.exception_table = {}
         if sfi.code is None:
             sfi.code = []
-        all_functions[sfi.name] = sfi
+        fns[sfi.name] = sfi
         return sfi.name
 
 
@@ -598,20 +696,19 @@ def parse_shared_function_info(lines, name: str, declarer: Optional[str] = None)
 # 入口
 # --------------------------
 
-def parse_file(file_path: str = "test.txt") -> Dict[str, SharedFunctionInfo]:
+def parse_file(file_path: str = "test.txt", state: Optional[ParseState] = None) -> Dict[str, SharedFunctionInfo]:
+    if state is None:
+        state = ParseState(all_functions=all_functions)
     try:
-        collect_fixed_arrays(file_path)
-        lines = get_next_line(file_path)
-        for line in lines:
-            if line is None:
-                break
-            if line == "Start SharedFunctionInfo":
-                parse_shared_function_info(lines, "start")
-        return all_functions
+        cursor = scan_file(state, file_path)
+        while (line := cursor.next()) is not None:
+            if line == _START_SFI:
+                parse_shared_function_info(state, "start")
+        return state.all_functions
     except Exception as e:
-        log_error(f"Fatal error parsing file '{file_path}': {e}")
+        log_error(state, f"Fatal error parsing file '{file_path}': {e}")
         print(f"Traceback:\n{traceback.format_exc()}")
-        return all_functions
+        return state.all_functions
 
 
 if __name__ == '__main__':
@@ -8,6 +8,7 @@ class CodeLine:
         self.line_num = line
         self.v8_instruction = inst
         self.translated = translated
+        self.has_open_brace = "{" in translated
         self.decompiled = decompiled
         self.visible = True
 
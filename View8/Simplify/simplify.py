@@ -1,3 +1,4 @@
+import atexit
 import re
 from Simplify.function_context_stack import function_context_stack
 
@@ -8,17 +9,31 @@ DEBUG_LOG_FILE = f"debug_{TARGET_DEBUG_ADDR}.log"
 def _debug_enabled_for(sfi_name: str) -> bool:
     return TARGET_DEBUG_ADDR in (sfi_name or "")
 
+# 日志句柄在首次写入时才打开，之后一直复用，进程退出时统一 flush/close
+_dbg_fh = None
+
+def _dbg_open(mode: str):
+    global _dbg_fh
+    if _dbg_fh is None:
+        _dbg_fh = open(DEBUG_LOG_FILE, mode, encoding="utf-8", buffering=8192)
+        atexit.register(_dbg_fh.close)
+    return _dbg_fh
+
 def _dbg_write(msg: str):
     try:
-        with open(DEBUG_LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(msg.rstrip("\n") + "\n")
+        fh = _dbg_fh if _dbg_fh is not None else _dbg_open("a")
+        fh.write(msg.rstrip("\n"))
+        fh.write("\n")
     except Exception:
         pass
 
 def _dbg_reset():
     try:
-        with open(DEBUG_LOG_FILE, "w", encoding="utf-8") as f:
-            f.write("")
+        if _dbg_fh is None:
+            _dbg_open("w")
+        else:
+            _dbg_fh.seek(0)
+            _dbg_fh.truncate()
     except Exception:
         pass
 # ======================================================
@@ -26,11 +41,33 @@ def _dbg_reset():
 # 基于 ScopeInfo 的父子关系与上下文编号映射（稳定分配）
 SCOPEINFO_PARENT = {}     # child_scope_info -> outer_scope_info
 SCOPE_CTXID = {}          # scope_info -> stable ctx id (int > 0)
+_SCOPE_CTXID_MAX = 0      # SCOPE_CTXID 中当前最大编号，追加新编号时直接 +1
 _SCOPEINFO_INIT = False
+# 图在 _init_scopeinfo_graph 之后不再变化，上溯/深度结果可以直接缓存
+_ASCEND_CACHE = {}        # (scope_info, steps) -> ancestor scope_info | None
+_DEPTH_CACHE = {None: 0}  # scope_info -> 到根的层数
 
 # 全局槽位环境：记录已知的槽位右值，供跨函数内联
-# key: (ctx_id:int, slot:int) -> value:str（已做寄存器常量替换后的字符串）
+# key: (ctx_id << _SLOT_BITS) | slot -> value:str（已做寄存器常量替换后的字符串）
+# 打包成单个 int，回调里查表不必每次构造 tuple；slot 超出位宽的不记录
 SCOPE_SLOT_ENV = {}
+_SLOT_BITS = 20
+_SLOT_LIMIT = 1 << _SLOT_BITS
+_MISSING = object()
+
+# 逐行热路径上用到的正则统一预编译
+_ASSIGN_RE = re.compile(r"^\s*(ACCU|CASE_\d+|[ra]\d+|Scope\[\d+\]\[\d+\])\s*=\s*(.+)$")
+_SCOPE_LHS_RE = re.compile(r"^\s*Scope\[([^\]]+)\]\[(\d+)\]\s*=")
+_SCOPE_EXPR_RE = re.compile(r"Scope\[([^\]]+)\](\[(\d+)\])?")
+_SLOT_OR_REG_RE = re.compile(r"Scope\[(\d+)\]\[(\d+)\]|(ACCU|CASE_\d+|[ra]\d+)")
+_SCOPE_HEAD_RE = re.compile(r"Scope\[(\d+)\]")
+_REG_RE = re.compile(r"(ACCU|CASE_\d+|[ra]\d+)")
+_DIGITS_RE = re.compile(r"\d+")
+# 值里可能被重新赋值的引用：寄存器与 Scope[n][m] 槽位（即赋值 LHS 的所有形态）
+_REG_USE_RE = re.compile(r"ACCU|CASE_\d+|[ra]\d+|Scope\[\d+\]\[\d+\]")
+# reg_is_constant：含调用则不是常量；否则看值的开头是否为字面量/Scope/ConstPool 等
+_CALL_RE = re.compile(r"[\w\]]\(")
+_CONST_VALUE_RE = re.compile(r"[\(]*(?:Scope|ConstPool|<|true|false|Undefined|Null|null|[+-]?\d)|[ra]\d+\[[\(]*ConstPool\[\d+\]")
 
 def _hex_to_int(addr: str) -> int:
     try:
@@ -45,7 +82,7 @@ def _init_scopeinfo_graph():
     - 收集所有 scope_info 与 outer_scope_info 地址；
     - 按十六进制地址升序分配 1..N 的稳定 ID 到 SCOPE_CTXID。
     """
-    global _SCOPEINFO_INIT
+    global _SCOPEINFO_INIT, _SCOPE_CTXID_MAX
     if _SCOPEINFO_INIT:
         return
     try:
@@ -67,9 +104,15 @@ def _init_scopeinfo_graph():
             addrs.add(oi)
 
     # 稳定编号：按地址排序固定映射
+    _ASCEND_CACHE.clear()
+    _DEPTH_CACHE.clear()
+    _DEPTH_CACHE[None] = 0
     sorted_addrs = sorted(addrs, key=_hex_to_int)
     for idx, addr in enumerate(sorted_addrs, start=1):
         SCOPE_CTXID[addr] = idx
+        # 顺带一次性填好深度表：每条链只上溯一次，之后按深度排序都是 O(1) 查表
+        _scopeinfo_depth(addr)
+    _SCOPE_CTXID_MAX = max(_SCOPE_CTXID_MAX, len(sorted_addrs))
 
     _SCOPEINFO_INIT = True
 
@@ -79,23 +122,49 @@ def _ctx_for_scopeinfo(scope_info: str) -> int:
     返回某个 scope_info 的稳定编号。
     解析阶段已一次性分配，正常不会缺；若缺，追加为新的最大编号（不影响既有映射）。
     """
-    if scope_info in SCOPE_CTXID:
-        return SCOPE_CTXID[scope_info]
-    new_id = (max(SCOPE_CTXID.values()) + 1) if SCOPE_CTXID else 1
-    SCOPE_CTXID[scope_info] = new_id
-    return new_id
+    global _SCOPE_CTXID_MAX
+    ctx_id = SCOPE_CTXID.get(scope_info)
+    if ctx_id is not None:
+        return ctx_id
+    _SCOPE_CTXID_MAX += 1
+    SCOPE_CTXID[scope_info] = _SCOPE_CTXID_MAX
+    return _SCOPE_CTXID_MAX
 
 
 def _ascend_scopeinfo(si: str | None, steps: int) -> str | None:
     """沿 ScopeInfo 链上溯 steps 层，返回祖先 scope_info。"""
+    key = (si, steps)
+    if key in _ASCEND_CACHE:
+        return _ASCEND_CACHE[key]
     cur = si
     for _ in range(steps):
         if not cur:
-            return None
+            cur = None
+            break
         cur = SCOPEINFO_PARENT.get(cur)
+    _ASCEND_CACHE[key] = cur
     return cur
 
 
+def _scopeinfo_depth(si: str | None) -> int:
+    """ScopeInfo 链上到根的层数；一次上溯顺带填好沿途所有节点的深度。"""
+    chain = []
+    seen = set()
+    cur = si
+    while cur not in _DEPTH_CACHE:
+        if cur in seen:
+            # 链上成环（如 scope info 与 outer 相同）：环入口按根处理
+            break
+        seen.add(cur)
+        chain.append(cur)
+        cur = SCOPEINFO_PARENT.get(cur)
+    d = _DEPTH_CACHE.get(cur, 0)
+    for addr in reversed(chain):
+        d += 1
+        _DEPTH_CACHE[addr] = d
+    return _DEPTH_CACHE[si]
+
+
 def _current_ctx_for_function(sfi) -> int:
     """
     决定“CURRENT 应替换成哪个编号”的策略（默认用本函数编号）：
@@ -109,19 +178,33 @@ def _current_ctx_for_function(sfi) -> int:
     return function_context_stack.get_func_context(sfi.name, getattr(sfi, "declarer", None))
 
 
+# 缩进前缀缓存：_TAB_CACHE[n] == '\t' * n，按需增长
+_TAB_CACHE = [""]
+
+def _indent(level: int) -> str:
+    while len(_TAB_CACHE) <= level:
+        _TAB_CACHE.append(_TAB_CACHE[-1] + "\t")
+    return _TAB_CACHE[level]
+
+
 class Register:
+    __slots__ = ("value", "was_overwritten", "all_initialized_index")
+
     def __init__(self, value, init_index, was_overwritten=False):
         self.value = value
         self.was_overwritten = was_overwritten
         self.all_initialized_index = [init_index]
 
 
+# 块头关键字 -> 块类型；按优先级排列（"else if" 归为 if），按子串匹配
+_BLOCK_TYPES = (("try", "try"), ("catch", "catch"), ("while", "loop"), ("switch", "case"),
+                ("case", "case"), ("if", "if"), ("else", "else"))
+
 def get_block_type(idx, lines):
     if idx == 0:
         return "function"
     first_block_line = lines[idx - 1].decompiled
-    block_types = {"try": "try", "catch": "catch", "while": "loop", "switch": "case", "case": "case", "if": "if", "else": "else"}
-    for keyword, block_type in block_types.items():
+    for keyword, block_type in _BLOCK_TYPES:
         if keyword in first_block_line:
             return block_type
     return "unknown"
@@ -130,57 +213,45 @@ def get_block_type(idx, lines):
 def reg_is_constant(reg, value):
     if reg.startswith(("ACCU", "CASE_")):
         return True
-    if re.search(r"[\w\]]\(", value):
+    if _CALL_RE.search(value):
         return False
-    if re.search(r"^[\(]*(Scope|ConstPool|<|true|false|Undefined|Null|null|[+-]?\d)", value):
-        return True
-    if re.search(r"^[ra]\d+\[[\(]*ConstPool\[\d+\]", value):
-        return True
-    return False
+    return _CONST_VALUE_RE.match(value) is not None
 
 
 def get_context_idx_from_var(var):
     if var.was_overwritten:
         return
-    match = re.match(r"Scope\[(\d+)\]", var.value)
+    match = _SCOPE_HEAD_RE.match(var.value)
     if match:
         return int(match.group(1))
     return None
 
 
+# reg -> 预编译的 "reg 后面不紧跟数字" 模式（r1 不应命中 r10）
+_REG_BOUNDARY = {}
+
 def is_reg_defined_in_reg_value(reg, value):
-    reg_len = len(reg)
-    idx = value.find(reg)
-    while idx != -1:
-        if idx + reg_len == len(value) or not value[idx + reg_len].isdigit():
-            return True
-        idx = value.find(reg, idx + 1)
+    pat = _REG_BOUNDARY.get(reg)
+    if pat is None:
+        pat = _REG_BOUNDARY[reg] = re.compile(re.escape(reg) + r"(?!\d)")
+    return pat.search(value) is not None
 
 
 def create_loop_reg_scope(prev_reg_scope):
-    reg_scope = {k: Register("", v.all_initialized_index[0], True) for k, v in prev_reg_scope.items() if not isinstance(v, int)}
-    reg_scope["current_context"] = prev_reg_scope["current_context"]
+    reg_scope = {k: Register("", v.all_initialized_index[0], True) for k, v in prev_reg_scope.items()}
     return reg_scope
 
 
 def close_loop_reg_scope(prev_reg_scope, reg_scope):
     for k, v in reg_scope.items():
-        if isinstance(v, int):
-            continue
         if v.was_overwritten and len(v.all_initialized_index) > 1 and k in prev_reg_scope and not prev_reg_scope[k].was_overwritten:
             prev_reg_scope[k].was_overwritten = True
             prev_reg_scope[k].all_initialized_index += reg_scope[k].all_initialized_index[1:]
 
 
-# 判断一个右值是否“简单可安全内联”：不包含括号(，避免把函数调用结果当常量
-_SIMPLE_VALUE_RE = re.compile(r'^[A-Za-z0-9_\[\]\."\'$:<>-]+$')  # 允许属性取值、字面量、ConstPool[...]、地址字符串等
-def _is_simple_slot_value(val: str) -> bool:
-    val = (val or "").strip()
-    if not val:
-        return False
-    if "(" in val or ")" in val:
-        return False
-    return bool(_SIMPLE_VALUE_RE.match(val))
+# 判断一个右值是否“简单可安全内联”：字符集本身不含括号，避免把函数调用结果当常量；
+# 非空由 + 保证（在 simplify_line 里对 strip 后的右值直接 match）
+_SIMPLE_VALUE_RE = re.compile(r'[A-Za-z0-9_\[\]\."\'$:<>-]+\Z')  # 允许属性取值、字面量、ConstPool[...]、地址字符串等
 
 
 class SimplifyCode:
@@ -192,17 +263,20 @@ class SimplifyCode:
         self.cur_ctx_id = ctx_id
         self.cur_scope_info = getattr(sfi, "scope_info_addr", None)
         self.outer_scope_info = getattr(sfi, "outer_scope_info_addr", None)
+        # outer 的编号对实例恒定，建图时已分配的直接取出；没分配的（建图失败）留到首次使用时再分配，
+        # 以免改变晚分配编号的先后
+        self.outer_ctx_id = SCOPE_CTXID.get(self.outer_scope_info) if self.outer_scope_info else None
         self._is_target = _debug_enabled_for(sfi.name)
-
-    def get_next_line(self):
-        self.line_index += 1
-        if self.line_index >= len(self.code):
-            print("Error decompiling {self.sfi.name}, no more lines.")
-        line_obj = self.code[self.line_index]
-        return line_obj.translated
+        # (expr, prefer_outer_for_slot) -> (idx, certain)；只缓存数字与 CURRENT[-n] 的结果
+        self._resolve_cache = {}
+        # 反向索引：寄存器/槽位 -> 值里引用了它的 reg_scope 键（只增不删，用时再核对）
+        self._uses = {}
+        # 非调试函数换成不带日志分支的特化版本（_is_target 对实例恒定）
+        if not self._is_target:
+            self.replace_scope_stack_with_idx = self._replace_scope_stack_with_idx_fast
 
     def add_simplified_line(self, line):
-        self.code[self.line_index].decompiled = '\t' * self.tab_level + line if line else ""
+        self.code[self.line_index].decompiled = _indent(self.tab_level) + line if line else ""
 
     def change_context(self, line, reg_scope):
         # 语言级 Push/PopContext 不改变我们分配的编号体系
@@ -223,12 +297,21 @@ class SimplifyCode:
         """
         expr = expr.strip()
 
+        # 数字与 CURRENT[-n] 的结果只取决于本函数的 scope 信息，可按实例缓存；
+        # 调试目标函数不读缓存，保证每次解析都有日志
+        key = (expr, prefer_outer_for_slot)
+        if not self._is_target:
+            hit = self._resolve_cache.get(key)
+            if hit is not None:
+                return hit
+
         # 纯数字：直接返回
-        if re.fullmatch(r"\d+", expr):
+        if _DIGITS_RE.fullmatch(expr):
             idx = int(expr)
             if self._is_target:
                 _dbg_write(f"[RESOLVE] '{expr}' -> {idx} (numeric)")
-            return idx, True  # 一定可替换
+            res = self._resolve_cache[key] = (idx, True)  # 一定可替换
+            return res
 
         # 解析 steps
         if "-" in expr:
@@ -239,36 +322,42 @@ class SimplifyCode:
         base = base.strip()
 
         if base == "CURRENT":
-            if steps == 0:
-                # 有槽位访问时，偏向父作用域编号（读场景）
-                if prefer_outer_for_slot and self.outer_scope_info:
-                    idx = _ctx_for_scopeinfo(self.outer_scope_info)
-                    if self._is_target:
-                        _dbg_write(f"[RESOLVE] 'CURRENT'(slot) -> {idx} (outer scope {self.outer_scope_info})")
-                    return idx, True
-                idx = self.cur_ctx_id or 0
-                if self._is_target:
-                    _dbg_write(f"[RESOLVE] 'CURRENT' -> {idx} (cur_ctx_id)")
-                return idx, bool(self.cur_ctx_id)
-            # 向上 steps 层
-            target_si = _ascend_scopeinfo(self.cur_scope_info, steps)
-            if not target_si:
-                if self._is_target:
-                    _dbg_write(f"[RESOLVE] 'CURRENT-{steps}' -> (no ancestor), keep as-is")
-                return 0, False
-            idx = _ctx_for_scopeinfo(target_si)
-            if self._is_target:
-                _dbg_write(f"[RESOLVE] 'CURRENT-{steps}' -> {idx} (scope_info {target_si})")
-            return idx, True
+            res = self._resolve_cache[key] = self._resolve_current(steps, prefer_outer_for_slot)
+            return res
 
         # 其它形式（如 r1-2）回退旧逻辑：以当前编号为起点上溯
-        start_ctx = reg_scope['current_context']
+        start_ctx = self.cur_ctx_id
         from Simplify.function_context_stack import function_context_stack as FCS
         idx = FCS.get_context(start_ctx, steps)
         if self._is_target:
             _dbg_write(f"[RESOLVE] '{expr}' (fallback from {start_ctx}, steps {steps}) -> {idx}")
         return idx, start_ctx != 0
 
+    def _resolve_current(self, steps: int, prefer_outer_for_slot: bool):
+        if steps == 0:
+            # 有槽位访问时，偏向父作用域编号（读场景）
+            if prefer_outer_for_slot and self.outer_scope_info:
+                idx = self.outer_ctx_id
+                if idx is None:
+                    idx = self.outer_ctx_id = _ctx_for_scopeinfo(self.outer_scope_info)
+                if self._is_target:
+                    _dbg_write(f"[RESOLVE] 'CURRENT'(slot) -> {idx} (outer scope {self.outer_scope_info})")
+                return idx, True
+            idx = self.cur_ctx_id or 0
+            if self._is_target:
+                _dbg_write(f"[RESOLVE] 'CURRENT' -> {idx} (cur_ctx_id)")
+            return idx, bool(self.cur_ctx_id)
+        # 向上 steps 层
+        target_si = _ascend_scopeinfo(self.cur_scope_info, steps)
+        if not target_si:
+            if self._is_target:
+                _dbg_write(f"[RESOLVE] 'CURRENT-{steps}' -> (no ancestor), keep as-is")
+            return 0, False
+        idx = _ctx_for_scopeinfo(target_si)
+        if self._is_target:
+            _dbg_write(f"[RESOLVE] 'CURRENT-{steps}' -> {idx} (scope_info {target_si})")
+        return idx, True
+
     def replace_scope_stack_with_idx(self, line, reg_scope, prev_reg_scope):
         """
         区分读写：
@@ -276,11 +365,11 @@ class SimplifyCode:
         - 其他出现（RHS/调用等）若紧跟 [slot]，则 prefer_outer_for_slot=True（偏向父编号）。
         """
         # 匹配整行 LHS：Scope[...][n] =
-        lhs_match = re.match(r"^\s*Scope\[([^\]]+)\]\[(\d+)\]\s*=", line)
+        lhs_match = _SCOPE_LHS_RE.match(line)
         lhs_span_start = lhs_match.start() if lhs_match else -1
 
         # 扩展匹配：捕获 Scope[...] 及可选的 [n]
-        pattern = re.compile(r"Scope\[([^\]]+)\](\[(\d+)\])?")
+        pattern = _SCOPE_EXPR_RE
 
         # 调试：预扫描
         if self._is_target:
@@ -322,49 +411,78 @@ class SimplifyCode:
 
         return out
 
-    def replace_reg_with_constant(self, line, reg_scope):
-        def replace_reg(match):
-            reg = match.group(1)
-            if reg not in reg_scope:
-                return reg
-            if not reg_scope[reg].was_overwritten:
-                self.code[reg_scope[reg].all_initialized_index[0]].visible = False
-                return reg_scope[reg].value
-            for idx in reg_scope[reg].all_initialized_index:
-                self.code[idx].visible = True
+    def _replace_scope_stack_with_idx_fast(self, line, reg_scope, prev_reg_scope):
+        """replace_scope_stack_with_idx 去掉调试输出后的版本，语义相同。"""
+        lhs_match = _SCOPE_LHS_RE.match(line)
+        lhs_span_start = lhs_match.start() if lhs_match else -1
+        resolve = self._resolve_scope_expr_to_index
+
+        def repl(match):
+            slot_suffix = match.group(2)
+            has_slot = slot_suffix is not None
+            is_lhs = has_slot and match.start() == lhs_span_start
+            idx, certain = resolve(
+                match.group(1), prefer_outer_for_slot=(has_slot and not is_lhs), reg_scope=reg_scope, prev_reg_scope=prev_reg_scope
+            )
+            if not certain or idx == 0:
+                return match.group(0)
+            return f"Scope[{idx}]{slot_suffix or ''}"
+
+        return _SCOPE_EXPR_RE.sub(repl, line)
+
+    def _replace_reg(self, reg, reg_scope):
+        var = reg_scope.get(reg)
+        if var is None:
             return reg
-        return re.sub(r"(ACCU|CASE_\d+|[ra]\d+)", replace_reg, line)
+        if not var.was_overwritten:
+            self.code[var.all_initialized_index[0]].visible = False
+            return var.value
+        for idx in var.all_initialized_index:
+            self.code[idx].visible = True
+        return reg
 
-    def _inline_scope_slot_reads_in_text(self, text: str) -> str:
+    def replace_reg_with_constant(self, line, reg_scope):
+        return _REG_RE.sub(lambda m: self._replace_reg(m.group(1), reg_scope), line)
+
+    def _inline_slots_and_regs(self, text: str, reg_scope) -> str:
         """
-        在一段文本里，把已知的 Scope[num][slot] 替换成记录的右值。
+        一次扫描完成两件事（等价于先内联槽位、再替换寄存器常量）：
+        - 已知的 Scope[num][slot] 替换成记录的右值（右值里的寄存器同样做常量替换）；
+        - 其余寄存器按 reg_scope 替换。
         仅替换 RHS，调用方需保证不是 LHS 的那一处。
         """
+        if "Scope[" not in text:
+            return self.replace_reg_with_constant(text, reg_scope)
+
         def repl(m):
+            reg = m.group(3)
+            if reg is not None:
+                return self._replace_reg(reg, reg_scope)
             num = int(m.group(1)); slot = int(m.group(2))
-            val = SCOPE_SLOT_ENV.get((num, slot))
+            val = SCOPE_SLOT_ENV.get((num << _SLOT_BITS) | slot) if slot < _SLOT_LIMIT else None
             if val is None:
                 return m.group(0)
             if self._is_target:
                 _dbg_write(f"[INLINE ] Scope[{num}][{slot}] -> {val}")
-            return val
-        return re.sub(r"Scope\[(\d+)\]\[(\d+)\]", repl, text)
+            return self.replace_reg_with_constant(val, reg_scope)
+        return _SLOT_OR_REG_RE.sub(repl, text)
 
-    def simplify_line(self, line, reg_scope, prev_reg_scope, overwritten_regs):
+    def simplify_line(self, line, reg_scope, prev_reg_scope, overwritten_regs, line_index):
         # 处理上下文切换
         if "PopContext" in line or "PushContext" in line:
             line = self.change_context(line, reg_scope)
 
         # 先做 Scope[CURRENT]/[CURRENT-1] 等解析、并区分读/写
+        # 不含 "Scope["/"=" 的行（括号、关键字等）直接跳过对应的正则
         original_line = line
-        line = self.replace_scope_stack_with_idx(line, reg_scope, prev_reg_scope)
+        if "Scope[" in line:
+            line = self.replace_scope_stack_with_idx(line, reg_scope, prev_reg_scope)
 
         # 赋值行？
-        m_assign = re.match(r"^\s*(ACCU|CASE_\d+|[ra]\d+|Scope\[\d+\]\[\d+\])\s*=\s*(.+)$", line)
+        m_assign = _ASSIGN_RE.match(line) if "=" in line else None
         if not m_assign:
-            # 非赋值行：先内联已知槽位，再替换寄存器常量
-            line2 = self._inline_scope_slot_reads_in_text(line)
-            out_line = self.replace_reg_with_constant(line2, reg_scope)
+            # 非赋值行：内联已知槽位并替换寄存器常量
+            out_line = self._inline_slots_and_regs(line, reg_scope)
             if self._is_target and out_line != original_line:
                 _dbg_write(f"[CONST  ] line {self.line_index}: {original_line}  ==>  {out_line}")
             return out_line
@@ -373,54 +491,66 @@ class SimplifyCode:
         lhs = m_assign.group(1)
         rhs = m_assign.group(2).strip()
 
-        # 如果 RHS 里有 Scope[num][slot] 读取，先内联它们（RHS 才允许）
-        rhs = self._inline_scope_slot_reads_in_text(rhs)
-
-        # 然后做寄存器常量替换
-        rhs2 = self.replace_reg_with_constant(rhs, reg_scope)
+        # RHS 里的 Scope[num][slot] 读取先内联（RHS 才允许），同一遍里做寄存器常量替换
+        rhs2 = self._inline_slots_and_regs(rhs, reg_scope)
 
         # 记录寄存器生命周期
-        if lhs in reg_scope:
-            del reg_scope[lhs]
+        reg_scope.pop(lhs, None)
         if lhs in prev_reg_scope:
             prev_reg_scope[lhs].was_overwritten = True
-            overwritten_regs[lhs] = self.line_index
-        for k, v in reg_scope.items():
-            if type(v) == int:
-                continue
-            if is_reg_defined_in_reg_value(lhs, v.value):
-                reg_scope[k].was_overwritten = True
+            overwritten_regs[lhs] = line_index
+        # 只检查值里可能引用 lhs 的键；索引可能过期（键被重新赋值/不在本块），逐个核对
+        for k in self._uses.get(lhs, ()):
+            v = reg_scope.get(k)
+            if v is not None and is_reg_defined_in_reg_value(lhs, v.value):
+                v.was_overwritten = True
         if reg_is_constant(lhs, rhs2):
-            reg_scope[lhs] = Register(rhs2, self.line_index)
+            reg_scope[lhs] = Register(rhs2, line_index)
+            for ref in set(_REG_USE_RE.findall(rhs2)):
+                self._uses.setdefault(ref, set()).add(lhs)
 
         # 如果 LHS 是 Scope[num][slot]，并且 RHS 是“简单可内联”的表达式，记录到全局槽位环境
-        m_lhs_slot = re.match(r"^\s*Scope\[(\d+)\]\[(\d+)\]\s*$", lhs)
-        if m_lhs_slot:
-            num = int(m_lhs_slot.group(1)); slot = int(m_lhs_slot.group(2))
-            if _is_simple_slot_value(rhs2):
-                SCOPE_SLOT_ENV[(num, slot)] = rhs2
-                if self._is_target:
-                    _dbg_write(f"[ENVSET ] Scope[{num}][{slot}] = {rhs2}")
-            else:
-                # 复杂右值，不记录（也可选择删除已有记录保证保守正确）
-                if (num, slot) in SCOPE_SLOT_ENV:
+        # _ASSIGN_RE 已保证 LHS 只能是 ACCU/CASE_n/rn/an 或 Scope[n][m]，首字母 S 即槽位，直接切片取数
+        if lhs[0] == "S":
+            num_s, slot_s = lhs[6:-1].split("][")
+            num = int(num_s); slot = int(slot_s)
+            if slot < _SLOT_LIMIT:
+                key = (num << _SLOT_BITS) | slot
+                if _SIMPLE_VALUE_RE.match(rhs2.strip()):
+                    SCOPE_SLOT_ENV[key] = rhs2
                     if self._is_target:
+                        _dbg_write(f"[ENVSET ] Scope[{num}][{slot}] = {rhs2}")
+                else:
+                    # 复杂右值，不记录（也可选择删除已有记录保证保守正确）
+                    if SCOPE_SLOT_ENV.pop(key, _MISSING) is not _MISSING and self._is_target:
                         _dbg_write(f"[ENVDEL ] Scope[{num}][{slot}] (rhs not simple)")
-                    del SCOPE_SLOT_ENV[(num, slot)]
 
         return f"{lhs} = {rhs2}"
 
     def simplify_block(self, prev_reg_scope):
-        block_type = get_block_type(self.line_index, self.code)
+        # 行号与 code 用局部变量推进；self.line_index 只在交给子块/调试输出前同步
+        code = self.code
+        code_len = len(code)
+        block_type = get_block_type(self.line_index, code)
 
         reg_scope = prev_reg_scope.copy() if block_type != "loop" else create_loop_reg_scope(prev_reg_scope)
         overwritten_regs = {}
 
         self.add_simplified_line("{")
         self.tab_level += 1
-
-        while (line := self.get_next_line()) != "}":
-            if self._is_target and self.line_index == 1:
+        # 块内缩进不变（子块返回时已还原 tab_level），前缀取一次即可
+        indent = _indent(self.tab_level)
+
+        line_index = self.line_index
+        while True:
+            line_index += 1
+            if line_index >= code_len:
+                print("Error decompiling {self.sfi.name}, no more lines.")
+            line = code[line_index].translated
+            self.line_index = line_index
+            if line == "}":
+                break
+            if self._is_target and line_index == 1:
                 # 首行进入时，dump 一次翻译原文，便于对比
                 _dbg_write("[DUMP-TRANSLATED-BEGIN]")
                 for i, c in enumerate(self.code):
@@ -428,10 +558,16 @@ class SimplifyCode:
                         _dbg_write(f"{i:04d}: {c.translated}")
                 _dbg_write("[DUMP-TRANSLATED-END]")
             if line == "{":
-                self.simplify_block(prev_reg_scope | reg_scope)
+                # reg_scope 只会因 pop 丢键；键未丢时 prev | reg_scope 与 reg_scope 内容相同，
+                # 子块对 prev 只读键、只改 Register 对象，可直接复用而不再合并出新 dict
+                if prev_reg_scope.keys() <= reg_scope.keys():
+                    self.simplify_block(reg_scope)
+                else:
+                    self.simplify_block(prev_reg_scope | reg_scope)
+                line_index = self.line_index
                 continue
-            simplified = self.simplify_line(line, reg_scope, prev_reg_scope, overwritten_regs)
-            self.add_simplified_line(simplified)
+            simplified = self.simplify_line(line, reg_scope, prev_reg_scope, overwritten_regs, line_index)
+            code[line_index].decompiled = indent + simplified if simplified else ""
 
         self.tab_level -= 1
         self.add_simplified_line("}")
@@ -457,7 +593,8 @@ def simplify_translated_bytecode(sfi, code):
     function_context_stack.add_function_context(sfi.name, ctx_id, declarer=sfi.declarer or sfi.name)
 
     # 目标函数：重置日志并打印头信息
-    if _debug_enabled_for(sfi.name):
+    is_dbg = _debug_enabled_for(sfi.name)
+    if is_dbg:
         _dbg_reset()
         _dbg_write("===== DEBUG for target function start =====")
         _dbg_write(f"name={sfi.name}")
@@ -473,10 +610,10 @@ def simplify_translated_bytecode(sfi, code):
         _dbg_write("==========================================")
 
     simpl = SimplifyCode(code, sfi, ctx_id)
-    regs = {"current_context": ctx_id}
-    simpl.simplify_block(regs)
+    # reg_scope 里只放 Register；函数的上下文编号由 SimplifyCode.cur_ctx_id 持有
+    simpl.simplify_block({})
 
-    if _debug_enabled_for(sfi.name):
+    if is_dbg:
         _dbg_write("===== DEBUG end =====")
 
     if simpl.line_index != len(code) - 1:
@@ -497,16 +634,9 @@ def simplify_all_in_scope_order():
     except Exception:
         return
 
-    # 计算每个函数的“outer 深度”
-    def depth_of(si_addr: str | None) -> int:
-        d, cur = 0, si_addr
-        while cur is not None:
-            cur = SCOPEINFO_PARENT.get(cur)
-            d += 1
-        return d
-
+    # 按每个函数的“outer 深度”排序（深度表已在建图时填好）
     funcs = list(all_functions.values())
-    funcs.sort(key=lambda f: depth_of(getattr(f, "outer_scope_info_addr", None)))  # 父在前
+    funcs.sort(key=lambda f: _scopeinfo_depth(getattr(f, "outer_scope_info_addr", None)))  # 父在前
 
     for sfi in funcs:
         simplify_translated_bytecode(sfi, sfi.code)
\ No newline at end of file
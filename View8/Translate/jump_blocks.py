@@ -1,4 +1,7 @@
-from bisect import bisect_left
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from itertools import chain
+from operator import attrgetter
 
 class CodeLine:
     def __init__(self, opcode="", line="", inst="", translated=""):
@@ -6,6 +9,7 @@ class CodeLine:
         self.line_num = line
         self.v8_instruction = inst
         self.translated = translated
+        self.has_open_brace = "{" in translated
         self.decompiled = ""
         self.visible = True
 
@@ -16,49 +20,87 @@ class JumpBlocks:
         self.code_list = code
         # Map offsets to lines
         self.code = {i.line_num: i for i in code}
-        # Use a sorted list of offsets for robust indexing and bisection
-        self.code_offset = sorted(self.code.keys())
+        # Track whether a line's translation holds a "{" so the jump handlers don't rescan it
+        for line in code:
+            line.has_open_brace = "{" in line.translated
+        # Use a sorted tuple of offsets for robust indexing and bisection
+        self.code_offset = tuple(sorted(self.code.keys()))
+        # Exact offsets (the common case for jump targets) resolve without bisecting
+        self.offset_to_idx = {off: i for i, off in enumerate(self.code_offset)}
+        self.code_arr = [self.code[off] for off in self.code_offset]
         self.jump_table = jump_table
-
-    def snap_to_existing_offset(self, offset):
-        # Return the closest existing offset at or before 'offset'.
+        # If/Jump jumps sorted by start for range queries. Jumps are only ever removed
+        # (jump_done), so entries are filtered lazily on their done flag.
+        self.jumps_by_start = {}
+        for jump_type in ("If", "Jump"):
+            jumps = sorted(jump_table[jump_type].values(), key=lambda x: x.start)
+            self.jumps_by_start[jump_type] = ([j.start for j in jumps], jumps)
+        # Catch jumps sorted by start with a parallel list of starts, kept in step with
+        # the Catch table by add_catch
+        self.catch_jumps = sorted(jump_table["Catch"].values(), key=lambda x: x.start)
+        self.catch_starts = [c.start for c in self.catch_jumps]
+
+    def snap_to_index(self, offset):
+        # Return the index of the closest existing offset at or before 'offset'.
+        idx = self.offset_to_idx.get(offset)
+        if idx is not None:
+            return idx
         if not self.code_offset:
             return None
         idx = bisect_left(self.code_offset, offset)
         if idx == 0:
             # Before the first; snap to first
-            return self.code_offset[0]
-        if idx == len(self.code_offset):
-            # Beyond last; snap to last
-            return self.code_offset[-1]
-        # If exact match
-        if self.code_offset[idx] == offset:
-            return offset
-        # Otherwise snap to previous existing offset
-        return self.code_offset[idx - 1]
+            return 0
+        # Otherwise snap to previous existing offset (beyond last snaps to last)
+        return idx - 1
+
+    def snap_to_existing_offset(self, offset):
+        # Return the closest existing offset at or before 'offset'.
+        idx = self.snap_to_index(offset)
+        if idx is None:
+            return None
+        return self.code_offset[idx]
 
     def get_line(self, offset):
         # Safely retrieve a CodeLine for a possibly missing offset by snapping.
-        snapped = self.snap_to_existing_offset(offset)
-        if snapped is None:
+        line = self.code.get(offset)
+        if line is not None:
+            return line
+        idx = self.snap_to_index(offset)
+        if idx is None:
             return None
-        return self.code.get(snapped, None)
+        return self.code_arr[idx]
+
+    def jumps_starting_in(self, jump_type, range_start, range_end=None):
+        # Pending jumps of a type with range_start <= start (<= range_end), in start order
+        starts, jumps = self.jumps_by_start[jump_type]
+        lo = bisect_left(starts, range_start)
+        hi = len(starts) if range_end is None else bisect_right(starts, range_end)
+        return (jmp for jmp in jumps[lo:hi] if not jmp.done)
+
+    def iter_if_and_jump(self, range_start, range_end=None):
+        # If jumps first, then Jump jumps, without building an intermediate list
+        return chain(self.jumps_starting_in("If", range_start, range_end),
+                     self.jumps_starting_in("Jump", range_start, range_end))
+
+    def add_catch(self, catch):
+        self.jump_table["Catch"][catch.start] = catch
+        idx = bisect_left(self.catch_starts, catch.start)
+        if idx < len(self.catch_starts) and self.catch_starts[idx] == catch.start:
+            self.catch_jumps[idx] = catch
+            return
+        self.catch_starts.insert(idx, catch.start)
+        self.catch_jumps.insert(idx, catch)
 
     def jump_done(self, jmp):
         jmp.done = True
-        if jmp.start in self.jump_table[jmp.type]:
-            del self.jump_table[jmp.type][jmp.start]
+        self.jump_table[jmp.type].pop(jmp.start, None)
 
     def get_relative_offset(self, offset, n):
         # return a relative line offset to a given offset using snapping and clamping
-        if not self.code_offset:
+        idx = self.snap_to_index(offset)
+        if idx is None:
             raise Exception("relative offset requested with empty code list")
-        idx = bisect_left(self.code_offset, offset)
-        # Snap to previous if not exact
-        if idx >= len(self.code_offset):
-            idx = len(self.code_offset) - 1
-        elif self.code_offset[idx] != offset and idx > 0:
-            idx -= 1
         new_idx = idx + n
         # Clamp
         if new_idx < 0:
@@ -72,6 +114,7 @@ class JumpBlocks:
         jump_list = [jmp for table in self.jump_table.values() for jmp in table.values()]
 
         # Adjust the end offset and leave starts as-is (we'll snap when using)
+        pending = []
         for jmp in jump_list:
             if jmp.start == jmp.end:
                 self.jump_done(jmp)
@@ -80,21 +123,25 @@ class JumpBlocks:
             if jmp.type not in {"Loop", "IntSwitch"}:
                 # Shift the end to the previous instruction (snapped)
                 jmp.end = self.get_relative_offset(jmp.end, -1)
+            pending.append(jmp)
 
-        jump_list.sort(key=lambda x: (float(x.start), float(x.end)))
-        return jump_list
+        # Self-jumps are already done, so only the pending ones need sorting
+        pending.sort(key=attrgetter('start', 'end'))
+        return pending
 
     def close_section(self, start, end):
-        # Snap to existing end, accounting for catch blocks
-        for catch in self.jump_table["Catch"].values():
-            if start < catch.start <= catch.end == catch.end:
+        # Snap to existing end, accounting for the first catch block inside the section
+        idx = bisect_right(self.catch_starts, start)
+        if idx < len(self.catch_starts):
+            catch = self.catch_jumps[idx]
+            if catch.start <= catch.end <= end:
                 end = catch.start
 
         end_line = self.get_line(end)
         if not end_line:
             return end
 
-        if "{" in end_line.translated:
+        if end_line.has_open_brace:
             end_line.translated = "\n}\n" + end_line.translated
         else:
             end_line.translated += "\n}\n"
@@ -115,8 +162,7 @@ class JumpBlocks:
     def handle_break(self, range_start, range_end):
         statement = "break"
         end_jumps = set()
-        jumps = list(self.jump_table["If"].values()) + list(self.jump_table["Jump"].values())
-        for break_jump in jumps:
+        for break_jump in self.iter_if_and_jump(range_start, range_end):
             if not range_start <= break_jump.start <= range_end < break_jump.end:
                 continue
 
@@ -124,19 +170,21 @@ class JumpBlocks:
             end_line = self.get_line(break_jump.end)
             if not start_line or not end_line:
                 continue
+            # An exact end offset is already the line number; only snapped ends need the line
+            end_num = break_jump.end if break_jump.end in self.offset_to_idx else end_line.line_num
 
             if break_jump.type == "If":
                 start_line.translated += f" {statement}"
-                end_jumps.add(end_line.line_num)
+                end_jumps.add(end_num)
                 self.jump_done(break_jump)
                 continue
 
-            if "{" in end_line.translated:
+            if end_line.has_open_brace:
                 start_line.translated = statement + start_line.translated
             else:
                 start_line.translated += statement
 
-            end_jumps.add(end_line.line_num)
+            end_jumps.add(end_num)
             self.jump_done(break_jump)
 
         return end_jumps
@@ -148,9 +196,7 @@ class JumpBlocks:
             return
 
         statement = "continue"
-        end_jumps = set()
-        jumps = list(self.jump_table["If"].values()) + list(self.jump_table["Jump"].values())
-        for continue_jump in jumps:
+        for continue_jump in self.iter_if_and_jump(range_start):
             if not (range_start <= continue_jump.start and near_loop_end <= continue_jump.end <= range_end):
                 continue
 
@@ -165,16 +211,14 @@ class JumpBlocks:
 
             if continue_jump.type == "If":
                 start_line.translated += f" {statement}"
-                end_jumps.add(end_line.line_num)
                 self.jump_done(continue_jump)
                 continue
 
-            if "{" in end_line.translated:
+            if end_line.has_open_brace:
                 start_line.translated = statement + start_line.translated
             else:
                 start_line.translated += statement
 
-            end_jumps.add(end_line.line_num)
             self.jump_done(continue_jump)
 
     def handle_loop(self, loop):
@@ -188,6 +232,7 @@ class JumpBlocks:
 
         # Wrap loop start and end in while (true) { }
         start_line.translated = "while (true)\n{\n" + start_line.translated
+        start_line.has_open_brace = True
         end_num = self.close_section(loop.start, loop.end)
         self.jump_done(loop)
 
@@ -209,6 +254,7 @@ class JumpBlocks:
 
         # Wrap try block around the start and end of try_jmp
         start_line.translated = "try\n{\n" + start_line.translated
+        start_line.has_open_brace = True
 
         # Find the corresponding catch jump
         catch_jump = self.jump_table["Jump"].get(try_jmp.end, None)
@@ -217,14 +263,16 @@ class JumpBlocks:
             catch_end_line = self.get_line(catch_jump.end)
             if catch_start_line:
                 catch_start_line.translated += "\n}\ncatch\n{"
+                catch_start_line.has_open_brace = True
             if catch_end_line:
                 catch_end_line.translated += "\n}\n"
-            self.jump_table["Catch"][catch_jump.start] = catch_jump
+            self.add_catch(catch_jump)
             self.jump_done(catch_jump)
         else:
             end_line = self.get_line(try_jmp.end)
             if end_line:
                 end_line.translated += "\n}\ncatch {}\n"
+                end_line.has_open_brace = True
         self.jump_done(try_jmp)
         return True
 
@@ -238,6 +286,7 @@ class JumpBlocks:
 
         # Begin the translation of the switch statement
         start_line.translated += f"\n{swt.case_line}\n{{\n"
+        start_line.has_open_brace = True
 
         switch_end = set()
         case = self.jump_table[swt.type].get(swt.end)
@@ -247,6 +296,7 @@ class JumpBlocks:
             case_start_line = self.get_line(case.start)
             if case_start_line:
                 case_start_line.translated = f'\n}}\n{case.case_line}\n{{\n' + case_start_line.translated
+                case_start_line.has_open_brace = True
 
             # Check for existence of case break
             # Since we shifted jumps one step back will shift also case start which is the end of last case
@@ -278,6 +328,7 @@ class JumpBlocks:
             first_end_line = self.get_line(switch_end[0])
             if first_end_line:
                 first_end_line.translated += '\n}\ndefault:\n{\n'
+                first_end_line.has_open_brace = True
             end = self.close_section(switch_end[0], switch_end[1])
             self.handle_break(switch_end[0], self.get_relative_offset(end, -1))
             return True
@@ -286,6 +337,7 @@ class JumpBlocks:
         penultimate_end_line = self.get_line(switch_end[-2])
         if penultimate_end_line:
             penultimate_end_line.translated += '\n}\ndefault:\n{\n'
+            penultimate_end_line.has_open_brace = True
         end = self.close_section(switch_end[-2], switch_end[-1])
         self.handle_break(switch_end[-2], end)
 
@@ -300,7 +352,7 @@ class JumpBlocks:
             return False
 
         # Collect all 'If' jump cases within the switch jump's range
-        cases = [c for c in self.jump_table['If'].values() if swt.start <= c.start <= swt.end <= c.end]
+        cases = [c for c in self.jumps_starting_in('If', swt.start, swt.end) if swt.end <= c.end]
         if not cases:
             return False
 
@@ -329,6 +381,7 @@ class JumpBlocks:
                 case_start_line = self.get_line(case.start)
                 if case_start_line:
                     case_start_line.translated = f"CASE_{idx} = ACCU"
+                    case_start_line.has_open_brace = False
 
             self.jump_done(case)
 
@@ -341,6 +394,7 @@ class JumpBlocks:
             case_end_line = self.get_line(case.end)
             if case_end_line:
                 case_end_line.translated += (case_line + "{\n")
+                case_end_line.has_open_brace = True
             prev_case_start = case.end
             case_line = "\n}\n"
 
@@ -397,12 +451,17 @@ class JumpBlocks:
 
     def get_or_and_table(self, all_if, last_if):
         known_type_table = {self.get_relative_offset(last_if.start, 1): "||", last_if.end: "&&"}
-        known_types = [(self.get_relative_offset(last_if.start, 1), "||"), (last_if.end, "&&")]
+        known_types = deque([(self.get_relative_offset(last_if.start, 1), "||"), (last_if.end, "&&")])
+
+        # Index the if jumps by end so each step only visits the jumps landing on known_start
+        end_to_ifs = defaultdict(list)
+        for jmp in all_if:
+            end_to_ifs[jmp.end].append(jmp)
 
         while known_types:
-            known_start, known_type = known_types.pop(0)
-            for jmp in all_if:
-                if jmp.end == known_start and jmp.start not in known_type_table:
+            known_start, known_type = known_types.popleft()
+            for jmp in end_to_ifs.get(known_start, ()):
+                if jmp.start not in known_type_table:
                     current_type = "||" if known_type == "&&" else "&&"
                     known_type_table[jmp.start] = current_type
                     known_types.append((jmp.start, current_type))
@@ -417,12 +476,13 @@ class JumpBlocks:
             first_line = self.get_line(first_if.start)
             if first_line:
                 first_line.translated = first_line.translated.replace(")", ") {}\n")
+                first_line.has_open_brace = "{" in first_line.translated
             self.jump_done(first_if)
             return True
 
         last_if = self.get_last_if_in_statement(first_if)
 
-        all_if = [i for i in self.jump_table['If'].values() if first_if.start <= i.start <= last_if.start and i.start != i.end]
+        all_if = [i for i in self.jumps_starting_in('If', first_if.start, last_if.start) if i.start != i.end]
         and_or_table = self.get_or_and_table(all_if, last_if)
 
         last_statement = "if"
@@ -442,6 +502,7 @@ class JumpBlocks:
         last_if_line = self.get_line(last_if.start)
         if last_if_line:
             last_if_line.translated += "\n{"
+            last_if_line.has_open_brace = True
 
         # Handle the else part if there is an else_jump
         else_jump = self.jump_table['Jump'].get(last_if.end, None)
@@ -449,6 +510,7 @@ class JumpBlocks:
             else_start = self.get_line(else_jump.start)
             if else_start:
                 else_start.translated += "\n}\nelse\n{"
+                else_start.has_open_brace = True
             end_num = self.close_section(else_jump.start, else_jump.end)
             self.jump_done(else_jump)
         else:
@@ -483,6 +545,7 @@ class JumpBlocks:
                 line = self.get_line(idx)
                 if line:
                     line.translated = ""
+                    line.has_open_brace = False
                 next_idx = self.get_relative_offset(idx, 1)
                 if next_idx == idx:
                     break  # avoid infinite loop on degenerate data
@@ -496,24 +559,25 @@ class JumpBlocks:
             last_line = self.get_line(end_target)
             if last_line:
                 last_line.translated = ""
+                last_line.has_open_brace = False
             self.jump_done(jmp)
 
         return True
 
     def expand_code_list(self):
-        self.code_list.insert(0, CodeLine(translated="{"))
-        i = 0
-        while i < len(self.code_list):
-            lines = self.code_list[i].translated.split('\n')
-            if len(lines) > 1:
-                self.code_list[i].translated = lines[0]
-                for line in lines[1:]:
-                    if not line:
-                        continue
-                    self.code_list.insert(i + 1, CodeLine(translated=line))
-                    i += 1
-            i += 1
-        self.code_list.append(CodeLine(translated="}"))
+        # Rebuild in one pass; code_list is the caller's list, so fill it in place
+        out = [CodeLine(translated="{")]
+        for code_line in self.code_list:
+            text = code_line.translated
+            if "\n" not in text:
+                out.append(code_line)
+                continue
+            lines = text.split('\n')
+            code_line.translated = lines[0]
+            out.append(code_line)
+            out.extend(CodeLine(translated=line) for line in lines[1:] if line)
+        out.append(CodeLine(translated="}"))
+        self.code_list[:] = out
 
     def convert(self):
         jump_type_handle = {"Loop": self.handle_loop,
@@ -528,7 +592,9 @@ class JumpBlocks:
         for jmp in jump_list:
             if jmp.done:
                 continue
-            jump_type_handle.get(jmp.type, lambda x: None)(jmp)
+            handler = jump_type_handle.get(jmp.type)
+            if handler:
+                handler(jmp)
         self.expand_code_list()
 
 
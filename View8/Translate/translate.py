@@ -1,6 +1,24 @@
 from Translate.translate_table import operands
 from Translate.jump_blocks import convert_jumps_to_logical_flow
 import re
+import sys
+
+# 可选的十六进制字节前缀 + 助记符 + 可选参数
+_MNEMONIC_RE = re.compile(r"^(?:(?:[0-9a-fA-F]{2}\s+)+)?([A-Za-z_][A-Za-z0-9._]*)\b(?:\s+(.*))?$")
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+
+def _split_instruction(inst):
+    """拆分指令文本为 (助记符, 参数串)；无法识别时返回 None。"""
+    head, _, rest = inst.partition(" ")
+    # 快速路径：首段本身就是助记符（排除形似字节前缀的两位十六进制）
+    if head.isascii() and "." not in (head[:1], head[-1:]) and head.replace(".", "_").isidentifier() \
+            and not (len(head) == 2 and _HEX_DIGITS.issuperset(head)):
+        return head, rest
+    m = _MNEMONIC_RE.match(inst)
+    if not m:
+        return None
+    return m.group(1), m.group(2) or ""
 
 
 class Jump:
@@ -44,21 +62,25 @@ class TranslateBytecode:
         self.jump_table = {"Loop": {}, "Exception": {}, "Catch": {}, "IntSwitch": {}, "If": {}, "Jump": {}, "IfJSReceiver": {}}
         self.add_exception_jumps(exception_table)
 
+        # 循环内只做局部名查找
+        get_handler = operands.get
+        intern = sys.intern
         for line in code:
             # 跳过占位或注释（由解析器填充缺失偏移时写入）
             if not line.v8_instruction or line.v8_instruction.startswith("//"):
                 continue
             # 仅接受以字母/下划线开头的助记符，避免把寄存器等当作操作码
-            m = re.match(r"^(?:(?:[0-9a-fA-F]{2}\s+)+)?([A-Za-z_][A-Za-z0-9._]*)\b(?:\s+(.*))?$", line.v8_instruction.strip())
-            if not m:
+            parts = _split_instruction(line.v8_instruction.strip())
+            if not parts:
                 continue
 
             self.offset = line.line_num
-            self.operator = m.group(1)
-            rest = m.group(2) or ""
+            op, rest = parts
+            # 助记符大量重复，驻留后与表中键按身份比较
+            self.operator = intern(op)
             self.args = [arg.strip() for arg in rest.split(", ")] if rest else []
 
-            handler = operands.get(self.operator)
+            handler = get_handler(self.operator)
             if not handler:
                 # 未知操作符直接跳过，避免报错
                 continue
@@ -2,6 +2,9 @@ import argparse
 import sys
 from Parser.sfi_file_parser import parse_file, all_functions
 
+# Number of exported functions joined into a single write
+EXPORT_BATCH = 1000
+
 
 def decompile(all_func):
     print(f"Decompiling {len(all_func)} functions.")
@@ -24,17 +27,25 @@ def export_to_file(output_file, all_func, export_format):
     if not format_list:
         format_list = ["decompiled"]
 
+    export_v8code = "v8_opcode" in format_list
+    export_translated = "translated" in format_list
+    export_decompiled = "decompiled" in format_list
+
     print(f"Exporting to file {output_file}.")
     with open(output_file, "w", encoding="utf-8", newline="\n") as f:
+        parts = []
         for function_name in all_func:
             sfi = all_functions[function_name]
-            content = sfi.export(
-                export_v8code=("v8_opcode" in format_list),
-                export_translated=("translated" in format_list),
-                export_decompiled=("decompiled" in format_list),
-            )
-            # content is plain str; writing with utf-8 avoids 'gbk' encode errors
-            f.write(content)
+            parts.append(sfi.export(
+                export_v8code=export_v8code,
+                export_translated=export_translated,
+                export_decompiled=export_decompiled,
+            ))
+            if len(parts) >= EXPORT_BATCH:
+                f.write("".join(parts))
+                parts.clear()
+        # content is plain str; writing with utf-8 avoids 'gbk' encode errors
+        f.write("".join(parts))
     print("Done.")
 
 
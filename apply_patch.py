@@ -26,23 +26,33 @@ Notable new arguments:
 
 import argparse
 import difflib
+import functools
+import io
 import os
 import re
+import shutil
 import subprocess
 import sys
 import tempfile
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 LABEL_OURS = "ours"
 LABEL_THEIRS = "theirs"
 
+CONFLICT_MARKER = f"<<<<<<< {LABEL_OURS}"
+CONFLICT_MARKER_BYTES = CONFLICT_MARKER.encode()
+
 RE_CONFLICT_START = re.compile(rf'^<<<<<<< {LABEL_OURS}\s*$')
 RE_CONFLICT_MID   = re.compile(r'^=======\s*$')
 RE_CONFLICT_END   = re.compile(rf'^>>>>>>> {LABEL_THEIRS}\s*$')
 
-CAST_TEMPLATE_RE = re.compile(rb'\b(?:v8::internal::)?Cast<([A-Za-z_][A-Za-z0-9_:]*)>\s*\(')
-CAST_PREFIX_RE   = re.compile(rb'\bv8::internal::Cast\s*\(')
+# '+++ b/<path>' at any line start (\n, \r\n or lone \r, as bytes.splitlines sees them)
+RE_CHANGED_FILE = re.compile(rb'(?:^|(?<=\r))\+\+\+ b/([^\r\n]*)', re.M)
+
+# Cast<T>( -> T::cast(   |   v8::internal::Cast( -> v8::internal::Script::cast(
+# one alternation, one pass (the two forms never overlap)
+CAST_RE = re.compile(rb'\b(?:v8::internal::)?Cast<([A-Za-z_][A-Za-z0-9_:]*)>\s*\(|\bv8::internal::Cast\s*\(')
 
 def run(cmd, cwd=None, input_bytes=None, verbose=False):
     """
@@ -67,11 +77,11 @@ def run(cmd, cwd=None, input_bytes=None, verbose=False):
 
 def parse_changed_files(patch_bytes: bytes) -> List[str]:
     files = []
-    for line in patch_bytes.splitlines():
-        if line.startswith(b"+++ b/"):
-            path = line[6:].decode(errors='replace').strip()
-            if path != "/dev/null":
-                files.append(path)
+    # scan the buffer in place instead of materializing every line
+    for m in RE_CHANGED_FILE.finditer(patch_bytes):
+        path = m.group(1).decode(errors='replace').strip()
+        if path != "/dev/null":
+            files.append(path)
     return files
 
 def needs_legacy_transform(root: str) -> bool:
@@ -88,13 +98,17 @@ def needs_legacy_transform(root: str) -> bool:
 def transform_added_line(line: bytes) -> bytes:
     # line starts with b'+', not header
     body = line[1:]
-    def repl_template(m):
+    # both patterns need a literal 'Cast'; most added lines have none
+    if b'Cast' not in body:
+        return line
+    def repl(m):
         t = m.group(1)
+        if t is None:
+            return b'v8::internal::Script::cast('
         return t + b'::cast('
-    body2 = CAST_TEMPLATE_RE.sub(repl_template, body)
-    body3 = CAST_PREFIX_RE.sub(b'v8::internal::Script::cast(', body2)
-    if body3 != body:
-        return b'+' + body3
+    body2 = CAST_RE.sub(repl, body)
+    if body2 != body:
+        return b'+' + body2
     return line
 
 def maybe_transform_patch(root: str, patch_bytes: bytes, verbose=False) -> Tuple[bytes, int]:
@@ -105,24 +119,21 @@ def maybe_transform_patch(root: str, patch_bytes: bytes, verbose=False) -> Tuple
     out_lines = []
     changed = 0
     for raw_line in patch_bytes.splitlines(keepends=True):
-        if raw_line.startswith(b'+++ b/'):
-            out_lines.append(raw_line)
-            continue
-        if raw_line.startswith(b'+') and not raw_line.startswith(b'+++ '):
-            new_line = transform_added_line(raw_line.rstrip(b'\n\r'))
-            # re-add original newline style (force LF for safety in patch)
-            if raw_line.endswith(b'\r\n'):
-                newline = b'\n'  # force unify to LF
-            elif raw_line.endswith(b'\n'):
-                newline = b'\n'
-            else:
-                newline = b'\n'
-            if new_line != raw_line.rstrip(b'\n\r'):
+        # only '+' lines need a closer look; everything else is context/removal/header
+        is_added = raw_line[:1] == b'+'
+        if is_added and raw_line.startswith(b'+++ '):
+            if raw_line.startswith(b'+++ b/'):
+                out_lines.append(raw_line)
+                continue
+            is_added = False
+        # normalize patch lines to LF endings to avoid CR artifacts (CRLF/CR/none -> LF)
+        stripped = raw_line.rstrip(b'\r\n')
+        if is_added:
+            new_line = transform_added_line(stripped)
+            if new_line != stripped:
                 changed += 1
-            out_lines.append(new_line + newline)
+            out_lines.append(new_line + b'\n')
         else:
-            # normalize patch lines to LF endings to avoid CR artifacts
-            stripped = raw_line.rstrip(b'\r\n')
             out_lines.append(stripped + b'\n')
     if verbose:
         print(f"[transform] old-api detected -> rewritten + lines: {changed}")
@@ -143,7 +154,6 @@ def file_contains_token(root: str, rel: str, token: str, ci: bool=False) -> bool
         return False
 
 def detect_conflicts_in_files(root: str, files: List[str]) -> List[str]:
-    marker = f"<<<<<<< {LABEL_OURS}".encode()
     conflict = []
     for rel in files:
         full = os.path.join(root, rel)
@@ -151,12 +161,34 @@ def detect_conflicts_in_files(root: str, files: List[str]) -> List[str]:
             continue
         try:
             with open(full, 'rb') as f:
-                if marker in f.read():
+                if CONFLICT_MARKER_BYTES in f.read():
                     conflict.append(rel)
         except Exception:
             pass
     return conflict
 
+def write_file_atomic(path: str, data: bytes):
+    """
+    Write via a temp file in the same directory + os.replace, so an interrupted
+    write never leaves a truncated source file. Keeps the original file mode.
+    """
+    d = os.path.dirname(path) or "."
+    with tempfile.NamedTemporaryFile('wb', dir=d, delete=False) as tf:
+        tf.write(data)
+        tmp = tf.name
+    try:
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+
+@functools.lru_cache(maxsize=200_000)
+def line_similarity(a: str, b: str) -> float:
+    # conflict blocks repeat many lines (braces, blanks, boilerplate), so cache per pair
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
 @dataclass
 class ConflictStat:
     file: str
@@ -164,47 +196,68 @@ class ConflictStat:
     resolved: int
     leftover: bool
 
-def resolve_conflicts_in_file(root: str, rel: str, threshold: float, verbose=False) -> ConflictStat:
+def resolve_conflicts_in_file(root: str, rel: str, threshold: float, verbose=False,
+                              data: Optional[bytes] = None) -> ConflictStat:
+    """
+    data: raw file content if the caller already read it (avoids a second read)
+    """
     full = os.path.join(root, rel)
-    with open(full, 'r', encoding='utf-8', errors='ignore') as f:
-        lines = f.readlines()
+    if data is None:
+        with open(full, 'rb') as f:
+            data = f.read()
+    # decode once; StringIO(newline=None) gives the same universal-newline lines as text-mode readlines()
+    lines = io.StringIO(data.decode('utf-8', errors='ignore'), newline=None).readlines()
     i = 0
     n = len(lines)
     out = []
     blocks = 0
     resolved = 0
     while i < n:
-        if RE_CONFLICT_START.match(lines[i]):
+        # cheap prefix test first; only marker-looking lines reach the regex
+        if lines[i].startswith('<<<<<<<') and RE_CONFLICT_START.match(lines[i]):
             blocks += 1
             i += 1
             ours = []
             theirs = []
-            while i < n and not RE_CONFLICT_MID.match(lines[i]):
+            while i < n and not (lines[i].startswith('=======') and RE_CONFLICT_MID.match(lines[i])):
                 ours.append(lines[i]); i += 1
             if i >= n:
                 out.extend(ours)
                 break
             i += 1  # skip =======
-            while i < n and not RE_CONFLICT_END.match(lines[i]):
+            while i < n and not (lines[i].startswith('>>>>>>>') and RE_CONFLICT_END.match(lines[i])):
                 theirs.append(lines[i]); i += 1
             if i >= n:
-                out.extend(ours + theirs)
+                out.extend(ours)
+                out.extend(theirs)
                 break
             i += 1  # skip >>>>>> theirs
             ours_clean = [l.rstrip('\n') for l in ours]
             theirs_clean = [l.rstrip('\n') for l in theirs]
-            result = list(theirs_clean)
+            # edit theirs_clean in place: a replaced slot is marked used and never compared again
+            result = theirs_clean
             used = [False]*len(theirs_clean)
+            # identical lines score 1.0, so the first unused exact match is always the best pick
+            positions = {}
+            for ti, t_line in enumerate(theirs_clean):
+                positions.setdefault(t_line, []).append(ti)
+            theirs_len = [len(t_line) for t_line in theirs_clean]
             for o_line in ours_clean:
-                best_idx = -1
-                best_ratio = 0.0
-                for ti, t_line in enumerate(theirs_clean):
-                    if used[ti]:
-                        continue
-                    ratio = difflib.SequenceMatcher(None, o_line, t_line).ratio()
-                    if ratio > best_ratio:
-                        best_ratio = ratio
-                        best_idx = ti
+                best_idx = next((ti for ti in positions.get(o_line, ()) if not used[ti]), -1)
+                best_ratio = 1.0 if best_idx != -1 else 0.0
+                if best_idx == -1:
+                    o_len = len(o_line)
+                    for ti, t_line in enumerate(theirs_clean):
+                        if used[ti]:
+                            continue
+                        # length-only upper bound (SequenceMatcher.real_quick_ratio): skip pairs that cannot win
+                        total = o_len + theirs_len[ti]
+                        if total and 2.0 * min(o_len, theirs_len[ti]) / total <= best_ratio:
+                            continue
+                        ratio = line_similarity(o_line, t_line)
+                        if ratio > best_ratio:
+                            best_ratio = ratio
+                            best_idx = ti
                 if best_idx != -1 and best_ratio >= threshold:
                     old_line = result[best_idx]
                     result[best_idx] = o_line
@@ -214,18 +267,20 @@ def resolve_conflicts_in_file(root: str, rel: str, threshold: float, verbose=Fal
                 else:
                     if verbose:
                         print(f"[conflict:{rel}] keep theirs (no match >= {threshold}) ours_line={o_line!r}")
-            for line_text in result:
-                out.append(line_text + '\n')
+            out.extend(line_text + '\n' for line_text in result)
             resolved += 1
         else:
             out.append(lines[i])
             i += 1
-    with open(full, 'w', encoding='utf-8') as f:
-        f.writelines(out)
-    leftover = False
-    with open(full, 'r', encoding='utf-8', errors='ignore') as f:
-        if f"<<<<<<< {LABEL_OURS}" in f.read():
-            leftover = True
+    # same bytes a text-mode utf-8 write would produce ('\n' -> os.linesep); skip the write if nothing changed
+    text = "".join(out)
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    new_data = text.encode('utf-8')
+    if new_data != data:
+        write_file_atomic(full, new_data)
+    # check what was just written instead of reading the file back; stops at the first marker
+    leftover = any(CONFLICT_MARKER in line_text for line_text in out)
     return ConflictStat(rel, blocks, resolved, leftover)
 
 def auto_resolve_conflicts(root: str, files: List[str], threshold: float, verbose=False) -> List[ConflictStat]:
@@ -235,9 +290,10 @@ def auto_resolve_conflicts(root: str, files: List[str], threshold: float, verbos
         if not os.path.isfile(full):
             continue
         with open(full, 'rb') as fd:
-            if f"<<<<<<< {LABEL_OURS}".encode() not in fd.read():
-                continue
-        stat = resolve_conflicts_in_file(root, rel, threshold, verbose=verbose)
+            data = fd.read()
+        if CONFLICT_MARKER_BYTES not in data:
+            continue
+        stat = resolve_conflicts_in_file(root, rel, threshold, verbose=verbose, data=data)
         stats.append(stat)
     return stats
 
@@ -361,7 +417,8 @@ def main():
             resolved_files = [s.file for s in stats if not s.leftover]
             if resolved_files:
                 run(["git", "add"] + resolved_files, cwd=root, verbose=args.verbose)
-            still = detect_conflicts_in_files(root, conflict_files)
+            # every conflict file went through auto-resolve, so its stat already says whether markers remain
+            still = [s.file for s in stats if s.leftover]
             if still:
                 unresolved = True
 